@@ -0,0 +1,6 @@
+"""
+Shared building blocks for the OpenCV parking detectors.
+
+The standalone detector script, the unified detector and the Django video
+feed all import from this package so they run the same detection code.
+"""
@@ -0,0 +1,142 @@
+"""
+Full-frame background model with per-slot readout.
+
+One running-average background image is kept for the whole frame (in
+float32, learned with cv2.accumulateWeighted). Each frame is compared to it
+once, the foreground mask is cleaned with a single morphological opening,
+and every slot's foreground pixel count comes from an integral-image lookup.
+Slots that are currently occupied learn at a much slower rate so a parked
+car is not absorbed into the background.
+
+The model can be saved to and loaded from disk so a restarted detector does
+not have to warm up again.
+"""
+
+import logging
+import os
+
+import cv2
+import numpy as np
+
+from .engine import clip_rects, corner_indices, rect_sums
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundModel:
+    """Running-average background model for a fixed set of slots"""
+
+    def __init__(self, rects, learning_rate=0.005, occupied_learning_rate=0.0002,
+                 diff_threshold=30, min_foreground=500, model_file=None):
+        self.rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+        self.learning_rate = learning_rate
+        self.occupied_learning_rate = occupied_learning_rate
+        self.diff_threshold = diff_threshold
+        self.min_foreground = min_foreground
+        self.model_file = model_file
+
+        n = len(self.rects)
+        self.foreground_counts = np.zeros(n, dtype=np.float64)
+        self._scratch = np.zeros(n, dtype=np.float64)
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+        self._shape = None
+        self.background = None
+        self.frames_learned = 0
+
+    def _allocate(self, height, width):
+        self._shape = (height, width)
+        self._gray_f = np.empty((height, width), dtype=np.float32)
+        self._diff = np.empty((height, width), dtype=np.float32)
+        self.foreground = np.empty((height, width), dtype=np.uint8)
+        self._learn_mask = np.empty((height, width), dtype=np.uint8)
+        self._integral = np.empty((height + 1, width + 1), dtype=np.float64)
+
+        self._clipped = clip_rects(self.rects, height, width)
+        self._corners = corner_indices(*self._clipped, width)
+
+    def load(self):
+        """Load a saved background if one matches; returns True on success"""
+        if not self.model_file or not os.path.exists(self.model_file):
+            return False
+        try:
+            with np.load(self.model_file) as data:
+                background = data['background'].astype(np.float32)
+                frames_learned = int(data['frames_learned'])
+        except Exception as e:
+            logger.warning(f"Could not load background model {self.model_file}: {e}")
+            return False
+
+        self._allocate(*background.shape)
+        self.background = background
+        self.frames_learned = frames_learned
+        logger.info(f"Background model loaded from {self.model_file} ({frames_learned} frames learned)")
+        return True
+
+    def adopt(self, other):
+        """Continue from another model's learned background (e.g. after a slot layout change)"""
+        if other.background is None:
+            return False
+        self._allocate(*other.background.shape)
+        self.background = other.background
+        self.frames_learned = other.frames_learned
+        return True
+
+    def save(self):
+        """Atomically write the background to model_file"""
+        if not self.model_file or self.background is None:
+            return False
+        tmp_file = f"{self.model_file}.tmp"
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, background=self.background, frames_learned=self.frames_learned)
+        os.replace(tmp_file, self.model_file)
+        return True
+
+    def apply(self, gray, occupied=None):
+        """Compare a grayscale frame to the model, then learn from it.
+
+        Returns each slot's foreground pixel count (an internal buffer).
+        ``occupied`` is the current committed state; those slots learn at
+        ``occupied_learning_rate``.
+        """
+        if self._shape != gray.shape:
+            self._allocate(*gray.shape)
+            self.background = None
+
+        np.copyto(self._gray_f, gray)
+        if self.background is None:
+            # Cold start: the first frame is the best guess of the empty lot
+            self.background = self._gray_f.copy()
+            self.foreground_counts[:] = 0
+            self.frames_learned = 1
+            return self.foreground_counts
+
+        cv2.absdiff(self._gray_f, self.background, dst=self._diff)
+        cv2.compare(self._diff, float(self.diff_threshold), cv2.CMP_GT, dst=self.foreground)
+        cv2.morphologyEx(self.foreground, cv2.MORPH_OPEN, self._kernel, dst=self.foreground)
+
+        cv2.integral(self.foreground, sum=self._integral, sdepth=cv2.CV_64F)
+        rect_sums(self._integral, self._corners, out=self.foreground_counts, scratch=self._scratch)
+        self.foreground_counts /= 255.0
+
+        self.learn(occupied)
+        return self.foreground_counts
+
+    def learn(self, occupied=None):
+        """Blend the last frame into the background, slower inside occupied slots"""
+        self._learn_mask.fill(255)
+        if occupied is not None and occupied.any():
+            x0, y0, x1, y1 = self._clipped
+            for index in np.flatnonzero(occupied):
+                self._learn_mask[y0[index]:y1[index], x0[index]:x1[index]] = 0
+
+            if self.occupied_learning_rate:
+                cv2.accumulateWeighted(self._gray_f, self.background, self.occupied_learning_rate,
+                                       mask=cv2.bitwise_not(self._learn_mask))
+
+        cv2.accumulateWeighted(self._gray_f, self.background, self.learning_rate, mask=self._learn_mask)
+        self.frames_learned += 1
+
+    def occupied(self, gray, occupied=None):
+        """Return a boolean occupancy vector for one grayscale frame"""
+        return self.apply(gray, occupied) > self.min_foreground
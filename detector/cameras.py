@@ -0,0 +1,64 @@
+"""
+Camera declarations.
+
+A lot can be covered by several cameras, each watching its own subset of
+``parking_slots``. Cameras are declared in detector_config.yaml:
+
+    cameras:
+      - id: "cam-a"
+        source: 0            # any key from the video section can be overridden
+        slots: ["A1", "A2"]  # omit to watch every slot
+
+Without a ``cameras`` section the ``video`` section describes a single
+camera, called "default", that watches every slot.
+"""
+
+import copy
+
+DEFAULT_CAMERA_ID = 'default'
+
+
+def camera_configs(config):
+    """Return the declared cameras, falling back to the single video source"""
+    cameras = config.get('cameras') or []
+    if not cameras:
+        return [{'id': DEFAULT_CAMERA_ID}]
+
+    seen = set()
+    for camera in cameras:
+        camera_id = str(camera.get('id', ''))
+        if not camera_id:
+            raise ValueError("Every camera needs an id")
+        if camera_id in seen:
+            raise ValueError(f"Duplicate camera id: {camera_id}")
+        seen.add(camera_id)
+    return cameras
+
+
+def apply_camera(config, camera_id):
+    """Return a copy of ``config`` narrowed to one camera.
+
+    The camera's video overrides are merged into ``video`` and
+    ``parking_slots`` is filtered to the camera's slot subset.
+    """
+    cameras = {str(camera['id']): camera for camera in camera_configs(config)}
+    if camera_id not in cameras:
+        raise ValueError(f"Unknown camera: {camera_id}")
+
+    camera = cameras[camera_id]
+    narrowed = copy.deepcopy(config)
+    narrowed['camera_id'] = camera_id
+
+    for key, value in camera.items():
+        if key not in ('id', 'slots'):
+            narrowed['video'][key] = value
+
+    if camera.get('slots') is not None:
+        wanted = [str(slot_id) for slot_id in camera['slots']]
+        by_id = {str(slot['id']): slot for slot in config['parking_slots']}
+        missing = [slot_id for slot_id in wanted if slot_id not in by_id]
+        if missing:
+            raise ValueError(f"Camera {camera_id} references unknown slots: {', '.join(missing)}")
+        narrowed['parking_slots'] = [by_id[slot_id] for slot_id in wanted]
+
+    return narrowed
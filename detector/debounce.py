@@ -0,0 +1,72 @@
+"""
+Temporal filter between raw detections and published slot changes.
+
+A shadow or a passer-by makes raw per-frame detections flicker. The
+debouncer keeps the last ``window`` raw detections of every slot in a NumPy
+ring buffer and only commits a new state once at least ``votes`` of them
+agree (N-of-M voting). With ``votes`` above half the window this gives
+hysteresis: a committed slot needs a clear majority to flip back. All slots
+are voted in one vectorized step per frame.
+"""
+
+import numpy as np
+
+
+class SlotDebouncer:
+    """N-of-M vote over a ring buffer of raw occupancy detections"""
+
+    def __init__(self, n_slots, window=5, votes=4):
+        window = max(1, int(window))
+        votes = int(votes)
+        if not window // 2 < votes <= window:
+            raise ValueError(f"debounce votes must be a majority of the window ({window // 2 + 1}..{window})")
+
+        self.window = window
+        self.votes = votes
+        self.history = np.zeros((window, n_slots), dtype=bool)
+        self.position = 0
+        # Raw detections recorded per slot, up to the window
+        self.filled = np.zeros(n_slots, dtype=np.int64)
+
+        # Committed state, and whether a slot has committed at least once
+        self.state = np.zeros(n_slots, dtype=bool)
+        self.known = np.zeros(n_slots, dtype=bool)
+
+    def update(self, raw):
+        """Feed one frame of raw detections; return indices of committed transitions.
+
+        A slot's first commit counts as a transition so its initial state
+        gets published.
+        """
+        self.history[self.position] = raw
+        self.position = (self.position + 1) % self.window
+        np.minimum(self.filled + 1, self.window, out=self.filled)
+
+        # Unfilled rows are all False, so they never count as occupied votes
+        occupied_votes = self.history.sum(axis=0)
+        vacant_votes = self.filled - occupied_votes
+
+        to_occupied = occupied_votes >= self.votes
+        to_vacant = vacant_votes >= self.votes
+        decided = to_occupied | to_vacant
+
+        new_state = np.where(to_occupied, True, np.where(to_vacant, False, self.state))
+        committed = (new_state != self.state) | (decided & ~self.known)
+
+        self.state = new_state
+        self.known |= decided
+        return np.flatnonzero(committed)
+
+    def adopt(self, other, indices, other_indices):
+        """Take over the votes and committed state of slots from another debouncer.
+
+        Slot ``other_indices[i]`` of ``other`` becomes slot ``indices[i]``
+        here. Raw history only carries over when both use the same window;
+        the committed state always does.
+        """
+        self.state[indices] = other.state[other_indices]
+        self.known[indices] = other.known[other_indices]
+        if other.window == self.window:
+            self.position = other.position
+            self.history[:, indices] = other.history[:, other_indices]
+            self.filled[indices] = other.filled[other_indices]
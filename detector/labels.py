@@ -0,0 +1,118 @@
+"""
+Ground-truth slot labels for recorded videos.
+
+A labels file is YAML describing, per interval of frames, which slots are
+occupied and which are vacant:
+
+    video: parking_lot.mp4   # relative to the labels file
+    intervals:
+      - start: 0             # first frame, inclusive
+        end: 848             # last frame, inclusive
+        occupied: [A1, A3]
+        vacant: [A2]
+
+Slots listed in neither list (or frames outside every interval) are
+unlabelled and left out of scoring, so ambiguous moments such as a car
+halfway into a bay need not be forced either way. Intervals may not
+overlap for the same slot.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+
+class GroundTruth:
+    """Per-frame labelled slot states loaded from a labels file"""
+
+    def __init__(self, intervals, video=None):
+        self.video = video
+        self.intervals = []
+
+        seen = {}
+        for interval in intervals:
+            start, end = int(interval['start']), int(interval['end'])
+            if end < start:
+                raise ValueError(f"Label interval ends before it starts: {start}-{end}")
+
+            occupied = {str(slot_id) for slot_id in interval.get('occupied') or []}
+            vacant = {str(slot_id) for slot_id in interval.get('vacant') or []}
+            both = occupied & vacant
+            if both:
+                raise ValueError(f"Slots labelled both occupied and vacant in {start}-{end}: {', '.join(sorted(both))}")
+
+            for slot_id in occupied | vacant:
+                for other_start, other_end in seen.get(slot_id, []):
+                    if start <= other_end and other_start <= end:
+                        raise ValueError(f"Overlapping labels for slot {slot_id}: {other_start}-{other_end} and {start}-{end}")
+                seen.setdefault(slot_id, []).append((start, end))
+
+            self.intervals.append((start, end, occupied, vacant))
+
+        self.slot_ids = sorted(seen)
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        with open(path, 'r') as f:
+            data = yaml.safe_load(f) or {}
+        video = data.get('video')
+        if video:
+            video = str(path.parent / video)
+        return cls(data.get('intervals') or [], video=video)
+
+    def states(self, frame_index, slot_ids):
+        """Return (labelled, occupied) boolean vectors for one frame, indexed like ``slot_ids``"""
+        labelled = np.zeros(len(slot_ids), dtype=bool)
+        occupied = np.zeros(len(slot_ids), dtype=bool)
+        for start, end, occupied_ids, vacant_ids in self.intervals:
+            if not start <= frame_index <= end:
+                continue
+            for index, slot_id in enumerate(slot_ids):
+                if slot_id in occupied_ids:
+                    labelled[index] = occupied[index] = True
+                elif slot_id in vacant_ids:
+                    labelled[index] = True
+        return labelled, occupied
+
+
+class ConfusionCounts:
+    """True/false positive and negative counts per slot"""
+
+    def __init__(self, n_slots):
+        self.tp = np.zeros(n_slots, dtype=np.int64)
+        self.fp = np.zeros(n_slots, dtype=np.int64)
+        self.fn = np.zeros(n_slots, dtype=np.int64)
+        self.tn = np.zeros(n_slots, dtype=np.int64)
+
+    def add(self, predicted, labelled, occupied):
+        self.tp += predicted & occupied & labelled
+        self.fp += predicted & ~occupied & labelled
+        self.fn += ~predicted & occupied & labelled
+        self.tn += ~predicted & ~occupied & labelled
+
+    @staticmethod
+    def scores(tp, fp, fn, tn):
+        """Precision, recall, F1 and accuracy; None where undefined"""
+        precision = tp / (tp + fp) if tp + fp else None
+        recall = tp / (tp + fn) if tp + fn else None
+        f1 = 2 * precision * recall / (precision + recall) if precision and recall else None
+        total = tp + fp + fn + tn
+        accuracy = (tp + tn) / total if total else None
+        return {
+            'tp': int(tp), 'fp': int(fp), 'fn': int(fn), 'tn': int(tn),
+            'precision': None if precision is None else round(precision, 4),
+            'recall': None if recall is None else round(recall, 4),
+            'f1': None if f1 is None else round(f1, 4),
+            'accuracy': None if accuracy is None else round(accuracy, 4),
+        }
+
+    def per_slot(self, slot_ids):
+        return {
+            slot_id: self.scores(self.tp[index], self.fp[index], self.fn[index], self.tn[index])
+            for index, slot_id in enumerate(slot_ids)
+        }
+
+    def overall(self):
+        return self.scores(self.tp.sum(), self.fp.sum(), self.fn.sum(), self.tn.sum())
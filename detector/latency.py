@@ -0,0 +1,59 @@
+"""
+Fixed-bucket latency histograms.
+
+Shared by the detector (benchmark output) and Django (the latency API), so
+both report the same buckets and summaries.
+"""
+
+import bisect
+import threading
+
+# Bucket upper bounds in milliseconds; the last bucket is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000, 300000)
+
+
+class LatencyHistogram:
+    """Counts of latencies per bucket, plus count, sum and max"""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        ms = max(0.0, seconds * 1000.0)
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile, capped at the maximum seen"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count and index < len(self.buckets):
+                return min(self.buckets[index], round(self.max_ms, 3))
+        return round(self.max_ms, 3)
+
+    def to_dict(self):
+        with self._lock:
+            buckets = {f"le_{bound}ms": count for bound, count in zip(self.buckets, self.counts)}
+            buckets['inf'] = self.counts[-1]
+            return {
+                'count': self.count,
+                'sum_ms': round(self.total_ms, 3),
+                'mean_ms': round(self.total_ms / self.count, 3) if self.count else None,
+                'p50_ms': self.quantile(0.5),
+                'p95_ms': self.quantile(0.95),
+                'p99_ms': self.quantile(0.99),
+                'max_ms': round(self.max_ms, 3),
+                'buckets': buckets,
+            }
@@ -0,0 +1,240 @@
+"""
+Detector metrics and a small HTTP endpoint to read them.
+
+Each ParkingDetector keeps a DetectorMetrics: frame rate, per-stage timing
+histograms, API request latency and error counts, and the age of the last
+frame. ``snapshot()`` turns them, together with the capture, scheduler and
+publisher stats, into a plain dict; supervised camera workers send these
+dicts to the supervisor, so one endpoint covers every camera.
+
+MetricsServer serves the collected snapshots from a background thread:
+
+    /metrics       Prometheus text exposition format
+    /metrics.json  the raw snapshot dict (used by ``run_detector --status``)
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .latency import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9108
+STAGES = ('queue', 'preprocess', 'detect', 'debounce', 'publish', 'annotate')
+
+
+class DetectorMetrics:
+    """Per-camera counters and histograms updated from the detection loop"""
+
+    def __init__(self, camera_id, fps_window=10.0):
+        self.camera_id = camera_id
+        self.fps_window = fps_window
+        self.started_at = time.time()
+
+        self.frames = 0
+        self.last_captured_at = None
+        self._frame_times = deque()
+        self.stages = {stage: LatencyHistogram() for stage in STAGES}
+
+        self.api_requests = 0
+        self.api_errors = 0
+        self.api_latency = LatencyHistogram()
+
+    def frame(self, captured_at=None):
+        """Count one processed frame"""
+        now = time.monotonic()
+        self.frames += 1
+        self.last_captured_at = captured_at or time.time()
+        self._frame_times.append(now)
+        while self._frame_times and now - self._frame_times[0] > self.fps_window:
+            self._frame_times.popleft()
+
+    def observe(self, stage, seconds):
+        self.stages[stage].add(seconds)
+
+    def api_request(self, seconds, ok):
+        self.api_requests += 1
+        if not ok:
+            self.api_errors += 1
+        self.api_latency.add(seconds)
+
+    @property
+    def fps(self):
+        if len(self._frame_times) < 2:
+            return 0.0
+        span = time.monotonic() - self._frame_times[0]
+        return (len(self._frame_times) - 1) / span if span > 0 else 0.0
+
+    def snapshot(self, capture=None, scheduler=None, publisher=None, outbox=None):
+        """JSON-friendly view of the metrics plus the given component stats"""
+        return {
+            'camera_id': self.camera_id,
+            'time': time.time(),
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'fps': round(self.fps, 2),
+            'frames': self.frames,
+            'last_captured_at': self.last_captured_at,
+            'last_frame_age_seconds': (
+                round(time.time() - self.last_captured_at, 3) if self.last_captured_at else None
+            ),
+            'stages': {stage: histogram.to_dict() for stage, histogram in self.stages.items()},
+            'api': {
+                'requests': self.api_requests,
+                'errors': self.api_errors,
+                'latency': self.api_latency.to_dict(),
+            },
+            'capture': capture,
+            'scheduler': scheduler,
+            'publisher': publisher,
+            'outbox': outbox,
+        }
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+def _histogram_lines(name, histogram, **labels):
+    """Prometheus histogram lines from a LatencyHistogram.to_dict() (ms) in seconds"""
+    lines = []
+    cumulative = 0
+    for key, count in histogram['buckets'].items():
+        cumulative += count
+        le = '+Inf' if key == 'inf' else str(float(key[3:-2]) / 1000.0)
+        lines.append(f"{name}_bucket{_labels(**labels, le=le)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {round(histogram['sum_ms'] / 1000.0, 6)}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram['count']}")
+    return lines
+
+
+def render_prometheus(collected):
+    """Render ``collect()`` output in the Prometheus text format.
+
+    ``collected`` has ``cameras`` ({camera id: snapshot}), and in supervised
+    mode ``workers`` (DetectorSupervisor.status()) and ``publishing`` (the
+    supervisor's own snapshot, which owns the API traffic).
+    """
+    metrics = {}
+
+    def add(name, kind, help_text, line):
+        entry = metrics.setdefault(name, [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+        entry.extend(line if isinstance(line, list) else [line])
+
+    def add_publishing(snap, **labels):
+        api = snap['api']
+        add('pms_detector_api_requests_total', 'counter', 'Requests sent to the Django API',
+            f"pms_detector_api_requests_total{_labels(**labels)} {api['requests']}")
+        add('pms_detector_api_errors_total', 'counter', 'Failed requests to the Django API',
+            f"pms_detector_api_errors_total{_labels(**labels)} {api['errors']}")
+        if api['latency']['count']:
+            add('pms_detector_api_request_seconds', 'histogram', 'Django API request latency',
+                _histogram_lines('pms_detector_api_request_seconds', api['latency'], **labels))
+
+        publisher = snap.get('publisher') or {}
+        if publisher:
+            add('pms_detector_publish_queue_depth', 'gauge', 'Slot updates waiting to be sent',
+                f"pms_detector_publish_queue_depth{_labels(**labels)} {publisher['queue_length']}")
+            add('pms_detector_publish_failed_total', 'counter', 'Slot updates dropped after all retries',
+                f"pms_detector_publish_failed_total{_labels(**labels)} {publisher['failed']}")
+            add('pms_detector_publish_breaker_open', 'gauge', '1 while the publisher circuit breaker is open',
+                f"pms_detector_publish_breaker_open{_labels(**labels)} {int(publisher['breaker'] != 'closed')}")
+        outbox = snap.get('outbox') or {}
+        if outbox:
+            add('pms_detector_outbox_pending', 'gauge', 'Updates in the durable outbox',
+                f"pms_detector_outbox_pending{_labels(**labels)} {outbox['pending']}")
+
+    for camera_id, snap in sorted(collected.get('cameras', {}).items()):
+        camera = _labels(camera=camera_id)
+        add('pms_detector_fps', 'gauge', 'Frames processed per second', f"pms_detector_fps{camera} {snap['fps']}")
+        add('pms_detector_frames_processed_total', 'counter', 'Frames run through detection',
+            f"pms_detector_frames_processed_total{camera} {snap['frames']}")
+        if snap.get('last_frame_age_seconds') is not None:
+            add('pms_detector_last_frame_age_seconds', 'gauge', 'Seconds since the last processed frame was captured',
+                f"pms_detector_last_frame_age_seconds{camera} {snap['last_frame_age_seconds']}")
+
+        capture = snap.get('capture') or {}
+        for key, name, kind, help_text in (
+            ('frames_captured', 'pms_detector_frames_captured_total', 'counter', 'Frames decoded by the capture thread'),
+            ('frames_dropped', 'pms_detector_frames_dropped_total', 'counter', 'Frames dropped because the queue was full'),
+            ('frames_skipped', 'pms_detector_frames_skipped_total', 'counter', 'Frames grabbed but skipped by the scheduler'),
+            ('queue_depth', 'pms_detector_capture_queue_depth', 'gauge', 'Frames waiting for detection'),
+        ):
+            if key in capture:
+                add(name, kind, help_text, f"{name}{camera} {capture[key]}")
+
+        for stage, histogram in snap['stages'].items():
+            if histogram['count']:
+                add('pms_detector_stage_seconds', 'histogram', 'Time spent per frame in each stage',
+                    _histogram_lines('pms_detector_stage_seconds', histogram, camera=camera_id, stage=stage))
+
+        add_publishing(snap, camera=camera_id)
+
+    if collected.get('publishing'):
+        add_publishing(collected['publishing'], camera='supervisor')
+
+    for camera_id, worker in sorted(collected.get('workers', {}).items()):
+        camera = _labels(camera=camera_id)
+        add('pms_detector_worker_up', 'gauge', '1 while the camera worker process is alive',
+            f"pms_detector_worker_up{camera} {int(worker['alive'])}")
+        add('pms_detector_worker_restarts_total', 'counter', 'Camera worker restarts',
+            f"pms_detector_worker_restarts_total{camera} {worker['restarts']}")
+
+    return '\n'.join(line for lines in metrics.values() for line in lines) + '\n'
+
+
+class MetricsServer:
+    """Serve ``collect()`` over HTTP from a daemon thread"""
+
+    def __init__(self, collect, port=DEFAULT_PORT, host='127.0.0.1'):
+        self.collect = collect
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path not in ('/metrics', '/metrics.json'):
+                    self.send_error(404)
+                    return
+                try:
+                    collected = server.collect()
+                    if path == '/metrics':
+                        body = render_prometheus(collected).encode('utf-8')
+                        content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                    else:
+                        body = json.dumps(collected).encode('utf-8')
+                        content_type = 'application/json'
+                except Exception as e:
+                    logger.error(f"Collecting metrics failed: {e}")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='metrics-server', daemon=True)
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Metrics available at http://{self.httpd.server_address[0]}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,97 @@
+"""
+Motion gate in front of the expensive detectors.
+
+Most slots look the same from one frame to the next. The gate keeps a
+downscaled grayscale reference of every slot as it was when the slot was
+last evaluated, diffs the downscaled current frame against it once, and
+sums changed pixels per slot with an integral image. Only slots whose
+changed-pixel ratio exceeds ``change_ratio`` (or that have not been
+evaluated for ``refresh_interval`` seconds) are passed on to the edge and
+background detectors; the rest keep their last state.
+"""
+
+import cv2
+import numpy as np
+
+from .engine import clip_rects, corner_indices, rect_sums
+
+
+class MotionGate:
+    """Per-slot change detector on a downscaled frame"""
+
+    def __init__(self, rects, downscale=4, pixel_threshold=15, change_ratio=0.02,
+                 refresh_interval=10.0):
+        self.rects = np.asarray(rects, dtype=np.int64).reshape(-1, 4)
+        self.downscale = max(1, int(downscale))
+        self.pixel_threshold = pixel_threshold
+        self.change_ratio = change_ratio
+        self.refresh_interval = refresh_interval
+
+        n = len(self.rects)
+        self.changed_counts = np.zeros(n, dtype=np.float64)
+        self.change_ratios = np.zeros(n, dtype=np.float64)
+        self.changed = np.zeros(n, dtype=bool)
+        self.active = np.ones(n, dtype=bool)
+        self.last_evaluated = np.full(n, -np.inf)
+        self._scratch = np.zeros(n, dtype=np.float64)
+
+        self._shape = None
+        self.reference = None
+
+    def _allocate(self, height, width):
+        self._shape = (height, width)
+        small_height = max(1, height // self.downscale)
+        small_width = max(1, width // self.downscale)
+        self._small_size = (small_width, small_height)
+
+        self.small = np.empty((small_height, small_width), dtype=np.uint8)
+        self.reference = np.zeros((small_height, small_width), dtype=np.uint8)
+        self._diff = np.empty((small_height, small_width), dtype=np.uint8)
+        self._integral = np.empty((small_height + 1, small_width + 1), dtype=np.float64)
+
+        # Slot rectangles in downscaled coordinates, rounded outwards
+        scaled = self.rects.copy()
+        scaled[:, 0] = self.rects[:, 0] // self.downscale
+        scaled[:, 1] = self.rects[:, 1] // self.downscale
+        scaled[:, 2] = -(-(self.rects[:, 0] + self.rects[:, 2]) // self.downscale) - scaled[:, 0]
+        scaled[:, 3] = -(-(self.rects[:, 1] + self.rects[:, 3]) // self.downscale) - scaled[:, 1]
+        self._clipped = clip_rects(scaled, small_height, small_width)
+        self._corners = corner_indices(*self._clipped, small_width)
+
+        x0, y0, x1, y1 = self._clipped
+        self._areas = np.maximum((x1 - x0) * (y1 - y0), 1).astype(np.float64)
+
+        # Nothing has a valid reference yet
+        self.last_evaluated[:] = -np.inf
+
+    def update(self, gray, now):
+        """Return the boolean mask of slots that need a full evaluation.
+
+        The mask is an internal buffer, valid until the next call.
+        ``changed`` holds the slots that actually changed, without the ones
+        only due for a periodic refresh.
+        """
+        if self._shape != gray.shape:
+            self._allocate(*gray.shape)
+
+        cv2.resize(gray, self._small_size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.absdiff(self.small, self.reference, dst=self._diff)
+        cv2.threshold(self._diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self._diff)
+        cv2.integral(self._diff, sum=self._integral, sdepth=cv2.CV_64F)
+
+        rect_sums(self._integral, self._corners, out=self.changed_counts, scratch=self._scratch)
+        self.changed_counts /= 255.0
+        np.divide(self.changed_counts, self._areas, out=self.change_ratios)
+
+        np.greater(self.change_ratios, self.change_ratio, out=self.changed)
+        np.copyto(self.active, self.changed)
+        self.active |= now - self.last_evaluated >= self.refresh_interval
+        return self.active
+
+    def commit(self, indices, now):
+        """Record that these slots were evaluated on the current frame"""
+        x0, y0, x1, y1 = self._clipped
+        for index in indices:
+            self.reference[y0[index]:y1[index], x0[index]:x1[index]] = \
+                self.small[y0[index]:y1[index], x0[index]:x1[index]]
+        self.last_evaluated[indices] = now
@@ -0,0 +1,185 @@
+"""
+Durable store-and-forward outbox for slot updates.
+
+With the outbox enabled, the detector does not send slot updates itself.
+It appends them to a local SQLite table and returns immediately. One drain
+thread sends the oldest entries to the API, in order, as batches, and
+deletes the ones the API accepted: ``send`` returns how many leading
+entries of a batch were delivered, so a batch that fails halfway keeps
+only its undelivered tail. Entries that were not delivered are still on
+disk after a restart and are sent then; delivered entries are gone, so
+nothing is replayed twice. The only gap is a crash between the API's
+reply and the local delete.
+
+While the API is down the drain thread backs off exponentially (with
+jitter) up to ``max_retry_delay`` and keeps every entry.
+"""
+
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    payload TEXT NOT NULL
+)
+"""
+
+
+class Outbox:
+    """Append-only SQLite queue of update dicts drained by one sender thread"""
+
+    def __init__(self, path, send, batch_size=100, retry_delay=1.0, max_retry_delay=60.0):
+        self.path = path
+        self.send = send
+        self.batch_size = max(1, int(batch_size))
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # WAL keeps appends cheap while the drain thread reads; NORMAL
+        # survives a process crash, which is what the outbox is for
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(SCHEMA)
+        self.pending = self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.appended = 0
+        self.sent = 0
+        self.send_errors = 0
+        self.backoff = 0.0
+
+        if self.pending:
+            logger.info(f"Outbox {path} holds {self.pending} undelivered updates")
+            self.start()
+
+    @classmethod
+    def from_config(cls, api_config, send, camera_id):
+        """Build an outbox from the ``api`` config section, or None if disabled"""
+        outbox = api_config.get('outbox', {})
+        if not outbox.get('enabled', False):
+            return None
+        return cls(
+            outbox.get('path', 'detector_outbox_{camera}.sqlite3').format(camera=camera_id),
+            send,
+            batch_size=outbox.get('batch_size', 100),
+            retry_delay=api_config.get('retry_delay', 1),
+            max_retry_delay=outbox.get('max_retry_delay', 60)
+        )
+
+    def append(self, updates):
+        """Durably queue update dicts for delivery in order"""
+        if not updates:
+            return
+        now = time.time()
+        rows = [(now, json.dumps(update)) for update in updates]
+        with self._lock:
+            with self._db:
+                self._db.executemany("INSERT INTO outbox (created_at, payload) VALUES (?, ?)", rows)
+            self.pending += len(rows)
+            self.appended += len(rows)
+        if self._thread is None:
+            self.start()
+        self._wake.set()
+
+    def _oldest(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, payload FROM outbox ORDER BY id LIMIT ?", (self.batch_size,)
+            ).fetchall()
+
+    def _delivered(self, last_id, count):
+        """Delete delivered entries, up to and including ``last_id``"""
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM outbox WHERE id <= ?", (last_id,))
+            self.pending = max(0, self.pending - count)
+            self.sent += count
+
+    def drain_once(self):
+        """Send one batch of the oldest entries; returns True if all of it was delivered (or empty)"""
+        rows = self._oldest()
+        if not rows:
+            return True
+
+        try:
+            delivered = self.send([json.loads(payload) for _, payload in rows])
+        except Exception as e:
+            logger.error(f"Sending {len(rows)} outbox entries raised: {e}")
+            delivered = 0
+        # A plain True/False stands for the whole batch
+        if isinstance(delivered, bool):
+            delivered = len(rows) if delivered else 0
+        delivered = max(0, min(int(delivered or 0), len(rows)))
+
+        if delivered:
+            self._delivered(rows[delivered - 1][0], delivered)
+        if delivered < len(rows):
+            self.send_errors += 1
+            return False
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.pending:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+
+            if self.drain_once():
+                if self.backoff:
+                    logger.info(f"Outbox delivering again ({self.pending} entries left)")
+                self.backoff = 0.0
+                continue
+
+            self.backoff = min(self.max_retry_delay, max(self.retry_delay, self.backoff * 2))
+            logger.warning(f"Outbox delivery failed, {self.pending} entries kept; retrying within {self.backoff:.0f}s")
+            self._stop.wait(random.uniform(self.backoff / 2, self.backoff))
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='outbox-drain', daemon=True)
+        self._thread.start()
+
+    def flush(self, timeout=5.0):
+        """Wait until the outbox is empty; returns True if it drained"""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return not self.pending
+
+    def close(self, timeout=5.0):
+        """Try to deliver what is left within ``timeout``; the rest stays on disk"""
+        if self._thread is not None:
+            self.flush(timeout)
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(5.0)
+            self._thread = None
+        with self._lock:
+            self._db.close()
+        if self.pending:
+            logger.info(f"Outbox {self.path} keeps {self.pending} updates for the next start")
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'appended': self.appended,
+            'sent': self.sent,
+            'send_errors': self.send_errors,
+            'backoff': self.backoff,
+        }
@@ -0,0 +1,261 @@
+"""
+Pooled slot-update publisher.
+
+Detectors hand slot updates to a SlotPublisher instead of starting a thread
+per request. Updates wait in a coalescing queue keyed by slot id (a newer
+state for a slot replaces the queued one, so the queue never holds more
+than one entry per slot) and a small, fixed pool of worker threads sends
+them through one keep-alive HTTP session. A slot is never sent by two
+workers at once: while one of its sends is in flight, a newer state for it
+waits in the queue, so states for a slot reach the API in order.
+
+``send`` returns how many leading updates it delivered (True or False
+stand for all or none). A failed send is not retried in place: the
+undelivered updates go back into the queue
+with an exponential, fully jittered delay, unless a newer state for the
+slot arrived meanwhile. After ``breaker_threshold`` consecutive failures a
+circuit breaker opens and sending pauses for ``breaker_reset`` seconds;
+then a single trial request decides whether it closes again. Updates keep
+coalescing while the breaker is open.
+"""
+
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class PendingUpdate:
+    """A queued update and its retry state"""
+
+    __slots__ = ('update', 'attempts', 'ready_at')
+
+    def __init__(self, update, attempts=0, ready_at=0.0):
+        self.update = update
+        self.attempts = attempts
+        self.ready_at = ready_at
+
+
+class SlotPublisher:
+    """Coalescing queue drained by a bounded pool of sender threads"""
+
+    def __init__(self, send, workers=2, batch_size=1, retry_attempts=3, retry_delay=1.0,
+                 max_retry_delay=30.0, breaker_threshold=5, breaker_reset=30.0, on_failure=None):
+        self.send = send
+        self.workers = max(1, int(workers))
+        self.batch_size = batch_size
+        self.retry_attempts = max(1, int(retry_attempts))
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        # Called with the updates that ran out of attempts
+        self.on_failure = on_failure
+
+        self._pending = {}
+        # Slots with a send in flight; their newer states wait until it finishes
+        self._sending = set()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._threads = []
+
+        self.breaker = CLOSED
+        self.breaker_opened_at = 0.0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+        self.send_errors = 0
+        self.breaker_trips = 0
+
+    @classmethod
+    def from_config(cls, api_config, send, batch=False, on_failure=None):
+        """Build a publisher from the ``api`` config section"""
+        publisher = api_config.get('publisher', {})
+        return cls(
+            send,
+            workers=publisher.get('workers', 2),
+            batch_size=publisher.get('max_batch', 100) if batch else 1,
+            retry_attempts=api_config.get('retry_attempts', 3),
+            retry_delay=api_config.get('retry_delay', 1),
+            max_retry_delay=publisher.get('max_retry_delay', 30),
+            breaker_threshold=publisher.get('breaker_threshold', 5),
+            breaker_reset=publisher.get('breaker_reset', 30),
+            on_failure=on_failure
+        )
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            self._stop = False
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"slot-publisher-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, updates):
+        """Queue update dicts (each with a ``slot_id``); the latest state per slot wins"""
+        if not self._threads:
+            self.start()
+        with self._cond:
+            for update in updates:
+                self.submitted += 1
+                if update['slot_id'] in self._pending:
+                    self.coalesced += 1
+                self._pending[update['slot_id']] = PendingUpdate(update)
+            self._cond.notify_all()
+
+    def _breaker_allows(self, now):
+        if self.breaker != OPEN:
+            return True
+        if now - self.breaker_opened_at >= self.breaker_reset:
+            # Let one trial request through
+            self.breaker = HALF_OPEN
+            return True
+        return False
+
+    def _take(self):
+        """Wait for sendable updates; returns a list, or None when stopping"""
+        with self._cond:
+            while True:
+                if self._stop and not self._pending:
+                    return None
+
+                now = time.monotonic()
+                wait = None
+                if self._breaker_allows(now) and (self.breaker != HALF_OPEN or self.in_flight == 0):
+                    sendable = [
+                        (slot_id, item) for slot_id, item in self._pending.items() if slot_id not in self._sending
+                    ]
+                    ready = [slot_id for slot_id, item in sendable if item.ready_at <= now]
+                    if ready:
+                        ready = ready[:1 if self.breaker == HALF_OPEN else self.batch_size]
+                        self.in_flight += 1
+                        self._sending.update(ready)
+                        return [self._pending.pop(slot_id) for slot_id in ready]
+                    if sendable:
+                        wait = min(item.ready_at for _, item in sendable) - now
+                elif self.breaker == OPEN:
+                    wait = self.breaker_opened_at + self.breaker_reset - now
+
+                if self._stop:
+                    # Nothing can be sent right now; give up on what is left
+                    return None
+                self._cond.wait(None if wait is None else max(wait, 0.01))
+
+    def _worker(self):
+        while True:
+            items = self._take()
+            if items is None:
+                return
+
+            try:
+                delivered = self.send([item.update for item in items])
+            except Exception as e:
+                logger.error(f"Publishing {len(items)} slot updates raised: {e}")
+                delivered = 0
+            if isinstance(delivered, bool):
+                delivered = len(items) if delivered else 0
+            delivered = max(0, min(int(delivered or 0), len(items)))
+
+            with self._cond:
+                self.in_flight -= 1
+                self._sending.difference_update(item.update['slot_id'] for item in items)
+                self.sent += delivered
+                if delivered == len(items):
+                    self.consecutive_failures = 0
+                    if self.breaker != CLOSED:
+                        logger.info("Publisher circuit breaker closed")
+                    self.breaker = CLOSED
+                else:
+                    self._failed(items[delivered:])
+                self._cond.notify_all()
+
+    def _failed(self, items):
+        """Re-queue failed updates with backoff and trip the breaker if needed"""
+        now = time.monotonic()
+        self.send_errors += 1
+        self.consecutive_failures += 1
+        if self.breaker == HALF_OPEN or (self.breaker == CLOSED and self.consecutive_failures >= self.breaker_threshold):
+            if self.breaker == CLOSED:
+                self.breaker_trips += 1
+            self.breaker = OPEN
+            self.breaker_opened_at = now
+            logger.warning(
+                f"Publisher circuit breaker open after {self.consecutive_failures} failures, "
+                f"pausing for {self.breaker_reset:.0f}s"
+            )
+
+        exhausted = []
+        for item in items:
+            slot_id = item.update['slot_id']
+            if slot_id in self._pending:
+                # A newer state superseded this one
+                continue
+            item.attempts += 1
+            if item.attempts >= self.retry_attempts:
+                exhausted.append(item.update)
+                continue
+            # Full jitter keeps many detectors from retrying in lockstep
+            ceiling = min(self.max_retry_delay, self.retry_delay * 2 ** (item.attempts - 1))
+            item.ready_at = now + random.uniform(0, ceiling)
+            self._pending[slot_id] = item
+            self.retries += 1
+
+        if exhausted:
+            self.failed += len(exhausted)
+            logger.error(f"Dropping {len(exhausted)} slot updates after {self.retry_attempts} attempts")
+            if self.on_failure is not None:
+                try:
+                    self.on_failure(exhausted)
+                except Exception as e:
+                    logger.error(f"Failure handler raised: {e}")
+
+    def flush(self, timeout=5.0):
+        """Wait until nothing is queued or in flight; returns True if drained"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self.in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout=5.0):
+        """Send what can still be sent within ``timeout``, then stop the workers"""
+        if self._threads:
+            self.flush(timeout)
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(1.0)
+        self._threads = []
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queue_length': len(self._pending),
+                'in_flight': self.in_flight,
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'sent': self.sent,
+                'retries': self.retries,
+                'failed': self.failed,
+                'send_errors': self.send_errors,
+                'breaker': self.breaker,
+                'breaker_trips': self.breaker_trips,
+                'consecutive_failures': self.consecutive_failures,
+            }
@@ -0,0 +1,145 @@
+"""
+Helpers for replaying a recorded video through the detector offline.
+
+Used by the ``benchmark_detector`` and ``evaluate_detector`` management
+commands: a stand-in for the API session so nothing is sent over the
+network, config rewriting for other working resolutions, and latency
+summaries.
+"""
+
+import copy
+import subprocess
+import time
+
+import cv2
+import numpy as np
+
+from .latency import LatencyHistogram
+
+
+class StubResponse:
+    status_code = 200
+    text = '{}'
+
+    def json(self):
+        return {}
+
+
+class StubSession:
+    """Drop-in for requests.Session that accepts every request locally"""
+
+    def __init__(self):
+        self.requests = 0
+        self.timeout = None
+        self.latency = LatencyHistogram()
+
+    def post(self, url, json=None, **kwargs):
+        self.requests += 1
+        # Capture-to-request latency of every update in the payload
+        now = time.time()
+        updates = json.get('updates', [json]) if isinstance(json, dict) else []
+        for update in updates:
+            if isinstance(update, dict) and update.get('captured_at'):
+                self.latency.add(now - update['captured_at'])
+        return StubResponse()
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def get(self, url, **kwargs):
+        self.requests += 1
+        return StubResponse()
+
+
+def parse_resolution(value):
+    """Parse a "WIDTHxHEIGHT" string into an int tuple"""
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise ValueError(f"Resolution must look like 640x480, got {value!r}")
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Resolution must be positive, got {value!r}")
+    return width, height
+
+
+def replay_config(config, method=None, resolution=None, motion_gate=True):
+    """Return a copy of a detector config set up for offline replay.
+
+    Slot coordinates are scaled from the configured working resolution to
+    ``resolution``. The background model is neither loaded nor saved, the
+    outbox is off, and the frame scheduler is off so every frame is
+    processed.
+    """
+    config = copy.deepcopy(config)
+    video = config['video']
+    detection = config['detection']
+    config['api'].setdefault('outbox', {})['enabled'] = False
+
+    if method:
+        detection['method'] = method
+    detection.setdefault('background', {})['model_file'] = None
+    detection.setdefault('motion_gate', {})['enabled'] = motion_gate
+    video['scheduler'] = {'enabled': False}
+
+    if resolution:
+        base_width = video.get('resize_width', resolution[0])
+        base_height = video.get('resize_height', resolution[1])
+        scale_x = resolution[0] / base_width
+        scale_y = resolution[1] / base_height
+        for slot in config['parking_slots']:
+            x, y, w, h = slot['coords']
+            slot['coords'] = [
+                int(round(x * scale_x)), int(round(y * scale_y)),
+                max(1, int(round(w * scale_x))), max(1, int(round(h * scale_y)))
+            ]
+        video['resize_width'], video['resize_height'] = resolution
+
+    return config
+
+
+def read_frames(source, max_frames=None):
+    """Yield (frame_index, decode_seconds, frame) for a video file"""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {source}")
+    try:
+        index = 0
+        while max_frames is None or index < max_frames:
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            elapsed = time.perf_counter() - start
+            if not ret:
+                break
+            yield index, elapsed, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def summarize(seconds):
+    """Mean and p50/p95/p99/max of a list of durations, in milliseconds"""
+    if not len(seconds):
+        return {'count': 0}
+    ms = np.asarray(seconds, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        'count': int(ms.size),
+        'total_s': round(float(ms.sum()) / 1000.0, 4),
+        'mean_ms': round(float(ms.mean()), 4),
+        'p50_ms': round(float(p50), 4),
+        'p95_ms': round(float(p95), 4),
+        'p99_ms': round(float(p99), 4),
+        'max_ms': round(float(ms.max()), 4),
+    }
+
+
+def git_revision(path):
+    """Short commit hash of the working tree, or None outside a git checkout"""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=path,
+            capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
@@ -0,0 +1,136 @@
+"""
+Adaptive frame-rate scheduler.
+
+An idle lot does not need 30 detections a second. The scheduler picks which
+source frames get decoded and processed: ``active_fps`` while something is
+happening (motion, a pending vote, a session about to arrive) and
+``idle_fps`` once nothing has changed for ``idle_after`` seconds. Frames in
+between are only grabbed (``cap.grab()``), which advances the source
+without decoding.
+
+Rates are turned into a frame stride over the source frame rate, so the
+same schedule works for live cameras and recorded files. An optional
+``cpu_budget`` (share of one core used by the camera's process) lowers the
+rate further whenever the measured CPU use exceeds it.
+
+take() runs on the capture thread and record() on the detection thread;
+the frame countdown they share is guarded by a lock.
+"""
+
+import threading
+import time
+
+
+class FrameScheduler:
+    """Decide which source frames to process"""
+
+    BUDGET_WINDOW = 2.0  # seconds of CPU use averaged per budget check
+
+    def __init__(self, source_fps=30.0, idle_fps=2.0, active_fps=15.0, idle_after=10.0,
+                 cpu_budget=None):
+        self.source_fps = source_fps if source_fps and source_fps > 0 else 30.0
+        self.active_fps = min(active_fps, self.source_fps)
+        self.idle_fps = min(idle_fps, self.active_fps)
+        self.idle_after = idle_after
+        self.cpu_budget = cpu_budget
+
+        self.rate = self.active_fps
+        self.budget_rate = self.active_fps
+        self.cpu_usage = 0.0
+        self.last_activity = time.monotonic()
+        self.expected_until = 0.0
+
+        self._lock = threading.Lock()
+        self._countdown = 0
+        self._next_due = None
+        self._budget_mark = (time.monotonic(), time.process_time())
+
+    @property
+    def stride(self):
+        """Process one frame out of every ``stride`` source frames"""
+        return max(1, int(round(self.source_fps / self.rate)))
+
+    @property
+    def idle(self):
+        return self.rate < self.active_fps
+
+    def take(self):
+        """Called once per source frame; True if this one should be decoded"""
+        with self._lock:
+            if self._countdown <= 0:
+                self._countdown = self.stride - 1
+                return True
+            self._countdown -= 1
+            return False
+
+    def pace(self):
+        """Sleep until the next source frame is due, for sources read faster than real time"""
+        now = time.monotonic()
+        if self._next_due is None or now - self._next_due > 1.0:
+            # First frame, or too far behind to catch up
+            self._next_due = now
+        self._next_due += 1.0 / self.source_fps
+        delay = self._next_due - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def expect_activity(self, duration):
+        """Hold the active rate for ``duration`` seconds, e.g. while a session is pending"""
+        self.expected_until = max(self.expected_until, time.monotonic() + duration)
+
+    def record(self, activity):
+        """Report the outcome of a processed frame and re-plan the rate"""
+        now = time.monotonic()
+        if activity:
+            self.last_activity = now
+
+        busy = now - self.last_activity < self.idle_after or now < self.expected_until
+        target = self.active_fps if busy else self.idle_fps
+
+        self._check_budget(now)
+        with self._lock:
+            self.rate = max(self.idle_fps, min(target, self.budget_rate))
+            if activity and self._countdown > 0:
+                # Pick up the faster rate immediately rather than after the idle stride
+                self._countdown = min(self._countdown, self.stride - 1)
+
+    def _check_budget(self, now):
+        if not self.cpu_budget:
+            return
+        mark_time, mark_cpu = self._budget_mark
+        elapsed = now - mark_time
+        if elapsed < self.BUDGET_WINDOW:
+            return
+
+        cpu = time.process_time()
+        self.cpu_usage = (cpu - mark_cpu) / elapsed
+        self._budget_mark = (now, cpu)
+
+        if self.cpu_usage > self.cpu_budget:
+            # Scale the processed rate down in proportion to the overrun
+            self.budget_rate = max(self.idle_fps, self.rate * self.cpu_budget / self.cpu_usage)
+        elif self.cpu_usage < 0.8 * self.cpu_budget:
+            self.budget_rate = min(self.active_fps, self.budget_rate * 1.25)
+
+    def stats(self):
+        """Counters for status logging and metrics"""
+        return {
+            'rate': round(self.rate, 2),
+            'stride': self.stride,
+            'idle': self.idle,
+            'cpu_usage': round(self.cpu_usage, 3),
+            'cpu_budget': self.cpu_budget,
+        }
+
+    @classmethod
+    def from_config(cls, config, source_fps):
+        """Build a scheduler from a ``scheduler`` config section, or None if disabled"""
+        if not config or not config.get('enabled', True):
+            return None
+        return cls(
+            source_fps=source_fps,
+            idle_fps=config.get('idle_fps', 2),
+            active_fps=config.get('active_fps', 15),
+            idle_after=config.get('idle_after', 10),
+            cpu_budget=config.get('cpu_budget')
+        )
@@ -0,0 +1,210 @@
+"""
+Shared-memory ring of annotated frames and slot states.
+
+The detector process owns one segment per camera and publishes every
+annotated frame into it together with the committed slot-state vector.
+Other processes on the host (Django's video feed and status APIs) attach
+read-only and get NumPy views straight onto the segment, so the camera is
+decoded exactly once.
+
+Layout of the segment:
+
+    header   magic, layout version, capacity, height, width, channels,
+             slot count, latest sequence, slot ids (JSON)
+    entries  capacity x (sequence, frame id, captured at, published at,
+                         slot states, frame pixels)
+
+Every entry carries the sequence number of the frame it holds and 0 while
+it is being written. A reader checks that sequence before and after using
+an entry (a seqlock); with ``capacity`` entries the writer only comes back
+to the latest entry ``capacity - 1`` frames later, which gives readers that
+long to encode or copy it.
+"""
+
+import json
+import logging
+import struct
+import sys
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PMSRING1'
+HEADER = struct.Struct('<8sIIIIIIQ')  # magic, layout, capacity, height, width, channels, slots, latest
+LAYOUT_VERSION = 1
+SLOT_IDS_SIZE = 4096
+ENTRY_META = struct.Struct('<QQdd')  # sequence, frame id, captured at, published at
+DATA_OFFSET = HEADER.size + SLOT_IDS_SIZE
+
+
+def _align(size, to=64):
+    return (size + to - 1) // to * to
+
+
+def _open_segment(name):
+    """Attach to an existing segment without letting this process's resource tracker unlink it"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    except Exception:
+        pass
+    return segment
+
+
+class FrameRing:
+    """Fixed-size ring of frames and slot states in a named shared-memory segment"""
+
+    def __init__(self, segment, owner):
+        self.segment = segment
+        self.owner = owner
+
+        magic, layout, capacity, height, width, channels, n_slots, _ = HEADER.unpack_from(segment.buf, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            raise ValueError(f"Shared memory segment {segment.name} is not a frame ring")
+
+        self.capacity = capacity
+        self.shape = (height, width, channels)
+        self.n_slots = n_slots
+        raw_ids = bytes(segment.buf[HEADER.size:DATA_OFFSET]).rstrip(b'\0')
+        self.slot_ids = json.loads(raw_ids.decode('utf-8')) if raw_ids else []
+
+        self.frame_size = height * width * channels
+        self.states_offset = ENTRY_META.size
+        self.frame_offset = _align(ENTRY_META.size + n_slots)
+        self.entry_size = _align(self.frame_offset + self.frame_size)
+
+        self._states = []
+        self._frames = []
+        for index in range(capacity):
+            base = DATA_OFFSET + index * self.entry_size
+            self._states.append(np.ndarray((n_slots,), dtype=np.bool_, buffer=segment.buf,
+                                           offset=base + self.states_offset))
+            self._frames.append(np.ndarray(self.shape, dtype=np.uint8, buffer=segment.buf,
+                                           offset=base + self.frame_offset))
+
+    @staticmethod
+    def segment_size(capacity, shape, n_slots):
+        frame_offset = _align(ENTRY_META.size + n_slots)
+        entry_size = _align(frame_offset + int(np.prod(shape)))
+        return DATA_OFFSET + capacity * entry_size
+
+    @classmethod
+    def create(cls, name, shape, slot_ids, capacity=4):
+        """Create (or replace a stale) segment and return the writer side"""
+        height, width = shape[:2]
+        channels = shape[2] if len(shape) > 2 else 1
+        encoded_ids = json.dumps(list(slot_ids)).encode('utf-8')
+        if len(encoded_ids) > SLOT_IDS_SIZE:
+            raise ValueError(f"Too many slot ids for the ring header ({len(encoded_ids)} bytes)")
+
+        size = cls.segment_size(capacity, (height, width, channels), len(slot_ids))
+        try:
+            segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a detector that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        segment.buf[:DATA_OFFSET] = bytes(DATA_OFFSET)
+        segment.buf[HEADER.size:HEADER.size + len(encoded_ids)] = encoded_ids
+        HEADER.pack_into(segment.buf, 0, MAGIC, LAYOUT_VERSION, capacity, height, width, channels,
+                         len(slot_ids), 0)
+        logger.info(f"Frame ring {name} created ({capacity} x {width}x{height}, {len(slot_ids)} slots)")
+        return cls(segment, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Attach read-only to a ring created by another process"""
+        return cls(_open_segment(name), owner=False)
+
+    @property
+    def name(self):
+        return self.segment.name
+
+    @property
+    def latest_sequence(self):
+        return HEADER.unpack_from(self.segment.buf, 0)[7]
+
+    def _entry_base(self, sequence):
+        return DATA_OFFSET + (sequence % self.capacity) * self.entry_size
+
+    def publish(self, frame, states, frame_id=0, captured_at=0.0, published_at=0.0):
+        """Write one frame and its slot states into the next entry"""
+        sequence = self.latest_sequence + 1
+        index = sequence % self.capacity
+        base = self._entry_base(sequence)
+
+        # Mark the entry as being written, fill it, then stamp it
+        ENTRY_META.pack_into(self.segment.buf, base, 0, frame_id, captured_at, published_at)
+        np.copyto(self._states[index], states, casting='unsafe')
+        np.copyto(self._frames[index], frame.reshape(self.shape))
+        ENTRY_META.pack_into(self.segment.buf, base, sequence, frame_id, captured_at, published_at)
+        struct.pack_into('<Q', self.segment.buf, HEADER.size - 8, sequence)
+        return sequence
+
+    def read(self, sequence=None):
+        """Views onto the latest (or a given) entry, or None if it is not readable.
+
+        Returns a dict with ``sequence``, ``frame_id``, ``captured_at``,
+        ``published_at``, ``states`` and ``frame``. The arrays point into
+        shared memory; call ``valid(entry)`` after using them to make sure
+        the writer did not overwrite the entry meanwhile.
+        """
+        if sequence is None:
+            sequence = self.latest_sequence
+        if sequence <= 0:
+            return None
+
+        index = sequence % self.capacity
+        stamped, frame_id, captured_at, published_at = ENTRY_META.unpack_from(
+            self.segment.buf, self._entry_base(sequence)
+        )
+        if stamped != sequence:
+            return None
+        return {
+            'sequence': sequence,
+            'frame_id': frame_id,
+            'captured_at': captured_at,
+            'published_at': published_at,
+            'states': self._states[index],
+            'frame': self._frames[index],
+        }
+
+    def valid(self, entry):
+        """True if ``entry`` still holds the frame it was read with"""
+        stamped = struct.unpack_from('<Q', self.segment.buf, self._entry_base(entry['sequence']))[0]
+        return stamped == entry['sequence']
+
+    def read_states(self):
+        """Consistent copy of the latest slot states as {slot_id: bool}, or None"""
+        for _ in range(3):
+            entry = self.read()
+            if entry is None:
+                return None
+            states = entry['states'].copy()
+            if self.valid(entry):
+                return dict(zip(self.slot_ids, states.tolist()))
+        return None
+
+    def close(self):
+        # Views must go before the buffer can be released
+        self._states = []
+        self._frames = []
+        try:
+            self.segment.close()
+        except BufferError:
+            # A caller still holds a view; the mapping goes away with it
+            pass
+        if self.owner:
+            try:
+                self.segment.unlink()
+            except FileNotFoundError:
+                pass
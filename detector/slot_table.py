@@ -0,0 +1,42 @@
+"""
+Compiled slot layout.
+
+``parking_slots`` in detector_config.yaml is a list of dicts. The detector
+compiles it once into a structure-of-arrays table so per-frame stages index
+NumPy arrays by slot position instead of looking up dict keys, and so
+decisions such as "which slots changed" are single vectorized comparisons.
+"""
+
+import numpy as np
+
+
+class SlotTable:
+    """Structure-of-arrays view of the configured parking slots"""
+
+    UNKNOWN_ZONE = 'Unknown'
+
+    def __init__(self, slots):
+        self.ids = [str(slot['id']) for slot in slots]
+        self.index = {slot_id: i for i, slot_id in enumerate(self.ids)}
+        if len(self.index) != len(self.ids):
+            raise ValueError("Duplicate slot ids in parking_slots configuration")
+
+        self.rects = np.array([slot['coords'] for slot in slots], dtype=np.int32).reshape(-1, 4)
+
+        # Zones are stored as small integer codes into zone_names
+        zones = [slot.get('zone') or self.UNKNOWN_ZONE for slot in slots]
+        self.zone_names = list(dict.fromkeys(zones))
+        zone_lookup = {zone: code for code, zone in enumerate(self.zone_names)}
+        self.zone_codes = np.array([zone_lookup[zone] for zone in zones], dtype=np.int16)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def zone_of(self, index):
+        """Return the zone name of the slot at an index"""
+        return self.zone_names[self.zone_codes[index]]
+
+    def coords(self, index):
+        """Return (x, y, w, h) of the slot at an index as plain ints"""
+        x, y, w, h = self.rects[index]
+        return int(x), int(y), int(w), int(h)
@@ -0,0 +1,225 @@
+"""
+Multi-camera detector supervisor.
+
+Every declared camera runs a ParkingDetector in its own worker process.
+Workers do not talk to the API themselves; they push slot updates onto one
+shared queue, and a single publisher thread in the supervisor coalesces
+them (latest state per slot wins) and hands each tick's updates to one
+publish call, so the API sees one coherent stream. Workers that crash are
+restarted with exponential backoff.
+
+Workers also send a metrics snapshot every few seconds on a second queue;
+the supervisor keeps the latest one per camera for the metrics endpoint.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+from .cameras import camera_configs
+
+logger = logging.getLogger(__name__)
+
+
+def run_camera_worker(detector_class, config_file, camera_id, update_queue, show_video, metrics_queue=None,
+                      capture_policy=None):
+    """Worker process entry point: run one camera until stopped (SIGTERM)"""
+    # The supervisor owns shutdown; let SIGINT reach it only
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    detector = detector_class(config_file, camera_id=camera_id, update_queue=update_queue,
+                              metrics_queue=metrics_queue)
+    if capture_policy:
+        detector.config['video']['capture_policy'] = capture_policy
+    if detector.run(show_video=show_video) is False:
+        # Camera unavailable: exit non-zero so the supervisor retries later
+        sys.exit(1)
+
+
+class CameraWorker:
+    """Book-keeping for one camera's worker process"""
+
+    def __init__(self, camera_id):
+        self.camera_id = camera_id
+        self.process = None
+        self.started_at = None
+        self.restarts = 0
+        self.backoff = 1.0
+        self.next_start = 0.0
+        self.finished = False
+
+
+class DetectorSupervisor:
+    """Start, watch and restart one detector worker per camera"""
+
+    MAX_BACKOFF = 60.0
+    STABLE_AFTER = 60.0  # seconds alive before the restart backoff resets
+    STATUS_INTERVAL = 300.0
+
+    def __init__(self, detector_class, config_file, config, camera_ids=None,
+                 show_video=False, publish=None, capture_policy=None):
+        self.detector_class = detector_class
+        self.config_file = config_file
+        self.show_video = show_video
+        self.publish = publish
+        # Command-line override of the config's video.capture_policy
+        self.capture_policy = capture_policy
+
+        declared = [str(camera['id']) for camera in camera_configs(config)]
+        if camera_ids:
+            unknown = [camera_id for camera_id in camera_ids if camera_id not in declared]
+            if unknown:
+                raise ValueError(f"Unknown cameras: {', '.join(unknown)}")
+            declared = [camera_id for camera_id in declared if camera_id in camera_ids]
+
+        self.context = multiprocessing.get_context('spawn')
+        self.update_queue = self.context.Queue()
+        # Workers send periodic metric snapshots; the latest per camera is kept
+        self.metrics_queue = self.context.Queue()
+        self._camera_metrics = {}
+        self.workers = {camera_id: CameraWorker(camera_id) for camera_id in declared}
+        self._stop = threading.Event()
+
+    def start_worker(self, worker):
+        process = self.context.Process(
+            target=run_camera_worker,
+            args=(self.detector_class, self.config_file, worker.camera_id,
+                  self.update_queue, self.show_video, self.metrics_queue, self.capture_policy),
+            name=f"detector-{worker.camera_id}",
+            daemon=True
+        )
+        process.start()
+        worker.process = process
+        worker.started_at = time.monotonic()
+        logger.info(f"Started camera {worker.camera_id} worker (PID {worker.process.pid})")
+
+    def check_workers(self):
+        """Start pending workers and schedule restarts for crashed ones"""
+        now = time.monotonic()
+        for worker in self.workers.values():
+            process = worker.process
+            if process is None:
+                if not worker.finished and now >= worker.next_start:
+                    self.start_worker(worker)
+                continue
+
+            if process.is_alive():
+                if now - worker.started_at > self.STABLE_AFTER:
+                    worker.backoff = 1.0
+                continue
+
+            process.join(0)
+            worker.process = None
+            if process.exitcode == 0:
+                logger.info(f"Camera {worker.camera_id} worker exited cleanly")
+                worker.finished = True
+                continue
+
+            logger.error(
+                f"Camera {worker.camera_id} worker crashed (exit code {process.exitcode}), "
+                f"restarting in {worker.backoff:.0f}s"
+            )
+            worker.next_start = now + worker.backoff
+            worker.backoff = min(worker.backoff * 2, self.MAX_BACKOFF)
+            worker.restarts += 1
+
+    def publish_loop(self):
+        """Drain worker updates, keep the latest per slot and publish them"""
+        while not self._stop.is_set():
+            try:
+                update = self.update_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            pending = {update['slot_id']: update}
+            while True:
+                try:
+                    update = self.update_queue.get_nowait()
+                except queue.Empty:
+                    break
+                pending[update['slot_id']] = update
+
+            try:
+                self.publish(list(pending.values()))
+            except Exception as e:
+                logger.error(f"Failed to publish {len(pending)} slot updates: {e}")
+
+    def collect_metrics(self):
+        """Keep the latest metrics snapshot each worker sent"""
+        while True:
+            try:
+                snapshot = self.metrics_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._camera_metrics[str(snapshot['camera_id'])] = snapshot
+
+    def camera_metrics(self):
+        """Latest snapshot per camera, with the frame age brought up to date"""
+        now = time.time()
+        cameras = {}
+        for camera_id, snapshot in list(self._camera_metrics.items()):
+            snapshot = dict(snapshot)
+            if snapshot.get('last_captured_at'):
+                snapshot['last_frame_age_seconds'] = round(now - snapshot['last_captured_at'], 3)
+            cameras[camera_id] = snapshot
+        return cameras
+
+    def stop(self, *args):
+        self._stop.set()
+
+    def reload(self, *args):
+        """Pass SIGHUP on so every worker re-reads the config"""
+        for worker in self.workers.values():
+            if worker.process and worker.process.is_alive():
+                os.kill(worker.process.pid, signal.SIGHUP)
+
+    def status(self):
+        """Per-camera worker state for logging"""
+        return {
+            camera_id: {
+                'pid': worker.process.pid if worker.process else None,
+                'alive': bool(worker.process and worker.process.is_alive()),
+                'restarts': worker.restarts,
+            }
+            for camera_id, worker in self.workers.items()
+        }
+
+    def run(self):
+        """Run until SIGTERM/SIGINT, then stop every worker"""
+        signal.signal(signal.SIGTERM, self.stop)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.reload)
+        logger.info(f"Supervising {len(self.workers)} camera(s): {', '.join(self.workers)}")
+
+        publisher = threading.Thread(target=self.publish_loop, name='slot-publisher', daemon=True)
+        publisher.start()
+
+        last_status = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                self.check_workers()
+                self.collect_metrics()
+                if all(worker.finished for worker in self.workers.values()):
+                    logger.info("All camera workers have exited")
+                    break
+
+                if time.monotonic() - last_status > self.STATUS_INTERVAL:
+                    last_status = time.monotonic()
+                    logger.info(f"Camera workers: {self.status()}")
+                self._stop.wait(1.0)
+        except KeyboardInterrupt:
+            logger.info("Supervisor stopped by user")
+        finally:
+            self._stop.set()
+            for worker in self.workers.values():
+                if worker.process and worker.process.is_alive():
+                    worker.process.terminate()
+            for worker in self.workers.values():
+                if worker.process:
+                    worker.process.join(5)
+            publisher.join(2)
+            logger.info("Supervisor shut down")
@@ -0,0 +1,204 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from .debounce import SlotDebouncer
+from .outbox import Outbox
+from .publisher import OPEN, SlotPublisher
+
+
+class FakeAPI:
+    """Records delivered updates; fails from the ``fail_at``-th update on"""
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.received = []
+
+    def send(self, updates):
+        for delivered, update in enumerate(updates):
+            if self.fail_at is not None and len(self.received) >= self.fail_at:
+                return delivered
+            self.received.append(update['slot_id'])
+        return len(updates)
+
+
+class ManualOutbox(Outbox):
+    """Outbox drained by the test through drain_once() instead of a thread"""
+
+    def start(self):
+        pass
+
+
+class OutboxTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'outbox.sqlite3')
+
+    def open(self, api):
+        outbox = ManualOutbox(self.path, api.send, batch_size=10)
+        self.addCleanup(outbox.close)
+        return outbox
+
+    def updates(self, *slot_ids):
+        return [{'slot_id': slot_id, 'is_occupied': True} for slot_id in slot_ids]
+
+    def test_delivers_in_order(self):
+        api = FakeAPI()
+        outbox = self.open(api)
+        outbox.append(self.updates('A1', 'A2', 'A3'))
+
+        self.assertTrue(outbox.drain_once())
+        self.assertEqual(api.received, ['A1', 'A2', 'A3'])
+        self.assertEqual(outbox.pending, 0)
+
+    def test_partial_failure_keeps_only_the_undelivered_tail(self):
+        api = FakeAPI(fail_at=2)
+        outbox = self.open(api)
+        outbox.append(self.updates('A1', 'A2', 'A3', 'A4'))
+
+        self.assertFalse(outbox.drain_once())
+        self.assertEqual(outbox.pending, 2)
+
+        api.fail_at = None
+        self.assertTrue(outbox.drain_once())
+        # Nothing delivered before the failure is sent again
+        self.assertEqual(api.received, ['A1', 'A2', 'A3', 'A4'])
+
+    def test_undelivered_entries_survive_a_restart(self):
+        outbox = self.open(FakeAPI(fail_at=0))
+        outbox.append(self.updates('A1', 'A2'))
+        self.assertFalse(outbox.drain_once())
+        outbox.close()
+
+        api = FakeAPI()
+        reopened = self.open(api)
+        self.assertEqual(reopened.pending, 2)
+        self.assertTrue(reopened.drain_once())
+        self.assertEqual(api.received, ['A1', 'A2'])
+
+
+class PublisherTests(unittest.TestCase):
+    def publisher(self, send, **kwargs):
+        publisher = SlotPublisher(send, retry_delay=0.01, **kwargs)
+        self.addCleanup(publisher.stop, 1.0)
+        return publisher
+
+    def test_newer_state_replaces_queued_one(self):
+        received = []
+        release = threading.Event()
+
+        def send(updates):
+            release.wait(2)
+            received.extend((update['slot_id'], update['is_occupied']) for update in updates)
+            return len(updates)
+
+        publisher = self.publisher(send, workers=1)
+        publisher.submit([{'slot_id': 'A0', 'is_occupied': True}])
+        # A1 is queued behind the blocked send, so its states coalesce
+        publisher.submit([{'slot_id': 'A1', 'is_occupied': True}])
+        publisher.submit([{'slot_id': 'A1', 'is_occupied': False}])
+        release.set()
+
+        self.assertTrue(publisher.flush(2))
+        self.assertEqual(received, [('A0', True), ('A1', False)])
+        self.assertEqual(publisher.stats()['coalesced'], 1)
+
+    def test_slot_is_never_sent_twice_at_once(self):
+        received = []
+        first_sent = threading.Event()
+        release = threading.Event()
+
+        def send(updates):
+            update = updates[0]
+            if update['is_occupied']:
+                first_sent.set()
+                release.wait(2)
+            received.append(update['is_occupied'])
+            return 1
+
+        publisher = self.publisher(send, workers=2)
+        publisher.submit([{'slot_id': 'A1', 'is_occupied': True}])
+        self.assertTrue(first_sent.wait(2))
+        # The second worker is idle but must not send A1 while the first send is in flight
+        publisher.submit([{'slot_id': 'A1', 'is_occupied': False}])
+        self.assertFalse(publisher.flush(0.2))
+        self.assertEqual(received, [])
+
+        release.set()
+        self.assertTrue(publisher.flush(2))
+        self.assertEqual(received, [True, False])
+
+    def test_failed_updates_are_retried(self):
+        attempts = []
+
+        def send(updates):
+            attempts.append(updates[0]['slot_id'])
+            return len(attempts) > 1
+
+        publisher = self.publisher(send, workers=1)
+        publisher.submit([{'slot_id': 'A1', 'is_occupied': True}])
+
+        self.assertTrue(publisher.flush(2))
+        self.assertEqual(attempts, ['A1', 'A1'])
+        self.assertEqual(publisher.stats()['sent'], 1)
+
+    def test_breaker_opens_after_consecutive_failures(self):
+        publisher = self.publisher(lambda updates: False, workers=1, retry_attempts=10,
+                                   breaker_threshold=2, breaker_reset=60)
+        publisher.submit([{'slot_id': 'A1', 'is_occupied': True}])
+
+        self.assertFalse(publisher.flush(0.5))
+        self.assertEqual(publisher.breaker, OPEN)
+        self.assertEqual(publisher.stats()['send_errors'], 2)
+
+
+class SlotDebouncerTests(unittest.TestCase):
+    def feed(self, debouncer, *frames):
+        """Feed raw frames (one bool per slot); return the transitions of each"""
+        return [debouncer.update(np.array(frame, dtype=bool)).tolist() for frame in frames]
+
+    def test_first_commit_waits_for_enough_votes(self):
+        debouncer = SlotDebouncer(2, window=5, votes=4)
+        transitions = self.feed(debouncer, *[(False, True)] * 4)
+
+        self.assertEqual(transitions, [[], [], [], [0, 1]])
+        self.assertEqual(debouncer.state.tolist(), [False, True])
+        self.assertTrue(debouncer.known.all())
+
+    def test_flicker_does_not_flip_a_committed_slot(self):
+        debouncer = SlotDebouncer(1, window=5, votes=4)
+        self.feed(debouncer, *[(False,)] * 5)
+
+        transitions = self.feed(debouncer, (True,), (False,), (True,), (True,), (False,))
+        self.assertEqual(transitions, [[]] * 5)
+        self.assertFalse(debouncer.state[0])
+
+        # A clear majority does flip it
+        self.assertEqual(self.feed(debouncer, (True,), (True,))[-1], [0])
+        self.assertTrue(debouncer.state[0])
+
+    def test_votes_must_be_a_majority(self):
+        for votes in (2, 6):
+            with self.subTest(votes=votes):
+                with self.assertRaises(ValueError):
+                    SlotDebouncer(1, window=5, votes=votes)
+
+    def test_adopt_carries_state_and_votes(self):
+        old = SlotDebouncer(2, window=3, votes=2)
+        self.feed(old, (True, False), (True, False), (False, False))
+
+        new = SlotDebouncer(3, window=3, votes=2)
+        new.adopt(old, [2, 0], [0, 1])
+        self.assertEqual(new.state.tolist(), [False, False, True])
+        self.assertEqual(new.known.tolist(), [True, False, True])
+        # Slot 2 kept its raw votes, one of them vacant, so one more vacant frame flips it
+        self.assertEqual(self.feed(new, (False, False, False)), [[2]])
+        self.assertFalse(new.state[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
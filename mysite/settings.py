@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'channels',
     'pms',  # Consolidated parking management system app (renamed from personal)
 ]
 
@@ -76,6 +77,24 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'mysite.wsgi.application'
+ASGI_APPLICATION = 'mysite.asgi.application'
+
+# Channel layer for the live dashboard WebSockets (pms/consumers.py).
+# The in-memory layer only reaches sockets served by the same process;
+# set REDIS_URL when running several ASGI workers.
+if os.environ.get('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.environ['REDIS_URL']]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
 
 
 # Database
@@ -198,6 +217,14 @@ API_KEYS = [
     'dashboard_api_key_2024'
 ]
 
+# Cameras served on /video-feed/?camera=<id>, as cv2.VideoCapture sources
+# (0 for webcam, 1 for droidcam, 'parking_lot.mp4' for the dummy video), or
+# 'shm:pms_feed_<camera>' to show the frames opencv_enhanced_detector.py
+# publishes to shared memory (shared_memory.enabled in detector_config.yaml)
+VIDEO_FEED_CAMERAS = {
+    'default': 0,
+}
+
 # Maximum request size (10MB)
 MAX_REQUEST_SIZE = 10 * 1024 * 1024
 
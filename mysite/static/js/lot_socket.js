@@ -0,0 +1,69 @@
+// Live lot updates over WebSocket (pms/consumers.py)
+//
+// LotSocket.connect({zone, onSlots, onResync, onEvent}) opens ws/lot/ (or
+// ws/lot/<zone>/) and reconnects with backoff. onSlots(event) gets each
+// pushed 'slots' event, whose entries pages apply in place with
+// LotSocket.merge(); onResync() runs, at most every 250 ms, when the page
+// has to reload /api/slot-status/ (on connect and on 'resync' events).
+// onEvent(event) gets every event. LotSocket.connected tells pages whether
+// they can stop polling.
+
+const LotSocket = {
+    connected: false,
+    socket: null,
+    retryDelay: 1000,
+    pending: null,
+
+    connect(options = {}) {
+        if (!('WebSocket' in window)) {
+            return;
+        }
+        this.options = options;
+        const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const path = options.zone ? `/ws/lot/${encodeURIComponent(options.zone)}/` : '/ws/lot/';
+        this.socket = new WebSocket(`${scheme}://${window.location.host}${path}`);
+
+        this.socket.onopen = () => {
+            this.connected = true;
+            this.retryDelay = 1000;
+            // Catch up on anything that changed while we were away
+            this.resync();
+        };
+
+        this.socket.onmessage = (message) => {
+            const event = JSON.parse(message.data);
+            if (this.options.onEvent) {
+                this.options.onEvent(event);
+            }
+            if (event.type === 'slots' && this.options.onSlots) {
+                this.options.onSlots(event);
+            } else if (event.type === 'resync') {
+                this.resync();
+            }
+        };
+
+        this.socket.onclose = () => {
+            this.connected = false;
+            setTimeout(() => this.connect(this.options), this.retryDelay);
+            this.retryDelay = Math.min(this.retryDelay * 2, 30000);
+        };
+    },
+
+    resync() {
+        if (!this.options.onResync || this.pending) {
+            return;
+        }
+        this.pending = setTimeout(() => {
+            this.pending = null;
+            this.options.onResync();
+        }, 250);
+    },
+
+    // Apply a 'slots' event to a slot status list; returns the new list, ordered by slot_id
+    merge(slots, event) {
+        const byId = new Map(slots.map(slot => [slot.id, slot]));
+        (event.removed || []).forEach(id => byId.delete(id));
+        event.slots.forEach(slot => byId.set(slot.id, slot));
+        return Array.from(byId.values()).sort((a, b) => a.slot_id < b.slot_id ? -1 : (a.slot_id > b.slot_id ? 1 : 0));
+    }
+};
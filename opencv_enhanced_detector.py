@@ -12,15 +12,33 @@ Features:
 import cv2
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
-import threading
 import logging
 import argparse
+import copy
+import os
+import signal
+import threading
 from datetime import datetime
 from pathlib import Path
 import yaml
 
+from detector.background import BackgroundModel
+from detector.cameras import DEFAULT_CAMERA_ID, apply_camera, camera_configs
+from detector.capture import FrameCapture, default_policy
+from detector.debounce import SlotDebouncer
+from detector.engine import OccupancyEngine
+from detector.metrics import DEFAULT_PORT, DetectorMetrics, MetricsServer
+from detector.motion import MotionGate
+from detector.outbox import Outbox
+from detector.publisher import SlotPublisher
+from detector.scheduler import FrameScheduler
+from detector.shm import FrameRing
+from detector.slot_table import SlotTable
+from detector.supervisor import DetectorSupervisor
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -32,41 +50,92 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds between metric snapshots sent from a camera worker to the supervisor
+METRICS_INTERVAL = 5
+
+# Attributes configure_detection() replaces, restored if a reload fails
+DETECTION_ATTRIBUTES = (
+    'occupancy_threshold', 'heartbeat_interval', 'detection_method', 'parking_slots', 'slots',
+    'engine', 'motion_gate', 'raw_states', 'debouncer', 'background',
+    'background_save_interval', 'slot_states'
+)
+# Config sections a reload does not apply
+RESTART_SECTIONS = ('api', 'video', 'shared_memory', 'metrics', 'cameras')
+
 class ParkingDetector:
-    def __init__(self, config_file='detector_config.yaml'):
-        self.config = self.load_config(config_file)
+    def __init__(self, config_file='detector_config.yaml', camera_id=None, update_queue=None, config=None,
+                 metrics_queue=None):
+        # An already loaded config (e.g. for offline replay) takes precedence over the file
+        self.config = config if config is not None else self.load_config(config_file)
+        self.camera_filter = camera_id
+        if camera_id is not None:
+            # Narrow video source and slots to one declared camera
+            self.config = apply_camera(self.config, camera_id)
+        self.camera_id = self.config.get('camera_id', DEFAULT_CAMERA_ID)
+        
+        # The config file is watched (and re-read on SIGHUP) unless the config was passed in
+        self.config_file = config_file if config is None else None
+        self.config_mtime = self.config_file_mtime()
+        self.loaded_config = copy.deepcopy(self.config)
+        self.reload_requested = False
+        self.stop_requested = False
+        self.last_config_check = time.monotonic()
+        
+        # Supervised workers hand updates (and metrics) to the supervisor instead of the API
+        self.update_queue = update_queue
+        self.metrics_queue = metrics_queue
+        self.metrics = DetectorMetrics(self.camera_id)
         self.api_url = self.config['api']['base_url']
         self.update_endpoint = f"{self.api_url}/api/update-slot/"
+        self.batch_endpoint = f"{self.api_url}/api/update-slots/"
+        self.publish_mode = self.config['api'].get('publish_mode', 'single')
         self.session_endpoint = f"{self.api_url}/api/parking-sessions/"
         
-        # Detection parameters
-        self.occupancy_threshold = self.config['detection']['occupancy_threshold']
-        self.update_interval = self.config['detection']['update_interval']
-        self.detection_method = self.config['detection']['method']
-        
-        # Parking slots configuration
-        self.parking_slots = self.config['parking_slots']
-        
-        # State tracking
-        self.last_sent = {}
-        self.slot_states = {}
+        # Slot table and every per-slot stage; rebuilt when the config is reloaded
+        self.configure_detection()
+        self.last_heartbeat = time.time()
         self.session = requests.Session()
         self.session.timeout = self.config['api']['timeout']
         
+        # Updates are delivered one of two ways (api.outbox.enabled picks):
+        # the outbox writes them to disk first and one drain thread sends
+        # them in order, surviving API outages and restarts; the publisher
+        # keeps them in memory, coalesced per slot, and sends them from a
+        # small pool of threads behind a circuit breaker. Supervised workers
+        # send nothing themselves, so they get neither
+        self.outbox = None
+        self.publisher = None
+        if update_queue is None:
+            self.outbox = Outbox.from_config(self.config['api'], self.publish_updates, self.camera_id)
+            if self.outbox is None:
+                self.publisher = SlotPublisher.from_config(
+                    self.config['api'], self.publish_updates, batch=self.publish_mode == 'batch'
+                )
+        # Each sender thread keeps its own keep-alive connection
+        adapter = HTTPAdapter(pool_maxsize=self.publisher.workers if self.publisher else 1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
         # Video capture
         self.cap = None
+        self.scheduler = None
+        self.capture = None
         self.frame_count = 0
+        self.working_frame = None
         
-        # Background subtractor for motion detection
-        self.bg_subtractor = cv2.createBackgroundSubtractorMOG2(
-            detectShadows=True,
-            varThreshold=self.config['detection']['var_threshold']
-        )
+        # Annotated frames and slot states shared with Django through shared memory
+        self.shared_memory = self.config.get('shared_memory', {})
+        self.frame_ring = None
         
-        logger.info("Parking detector initialized")
+        self.last_background_save = time.time()
+        if self.detection_method in ('background', 'hybrid'):
+            self.background.load()
+        
+        logger.info(f"Parking detector initialized (camera {self.camera_id}, {len(self.slots)} slots)")
 
-    def load_config(self, config_file):
-        """Load configuration from YAML file"""
+    @classmethod
+    def load_config(cls, config_file):
+        """Load configuration from YAML file (no detector is built, so nothing is opened)"""
         try:
             with open(config_file, 'r') as f:
                 config = yaml.safe_load(f)
@@ -74,29 +143,82 @@ class ParkingDetector:
             return config
         except FileNotFoundError:
             logger.warning(f"Config file {config_file} not found, using defaults")
-            return self.get_default_config()
+            return cls.get_default_config()
 
-    def get_default_config(self):
+    @staticmethod
+    def get_default_config():
         """Return default configuration"""
         return {
             'api': {
                 'base_url': 'http://127.0.0.1:8000',
                 'timeout': 5,
                 'retry_attempts': 3,
-                'retry_delay': 1
+                'retry_delay': 1,
+                'publish_mode': 'single',  # 'single' (one request per slot) or 'batch'
+                'publisher': {
+                    'workers': 2,
+                    'max_batch': 100,
+                    'max_retry_delay': 30,
+                    'breaker_threshold': 5,
+                    'breaker_reset': 30
+                },
+                'outbox': {
+                    'enabled': True,  # Durable delivery instead of the publisher
+                    'path': 'detector_outbox_{camera}.sqlite3',
+                    'batch_size': 100,
+                    'max_retry_delay': 60
+                }
             },
             'detection': {
                 'method': 'hybrid',  # 'edge', 'background', 'hybrid'
                 'occupancy_threshold': 0.1,
-                'update_interval': 2,
-                'var_threshold': 50,
-                'min_contour_area': 500
+                'debounce_window': 5,
+                'debounce_votes': 4,
+                'heartbeat_interval': 30,
+                'min_contour_area': 500,
+                'motion_gate': {
+                    'enabled': True,
+                    'downscale': 4,
+                    'pixel_threshold': 15,
+                    'change_ratio': 0.02,
+                    'refresh_interval': 10
+                },
+                'background': {
+                    'learning_rate': 0.005,
+                    'occupied_learning_rate': 0.0002,
+                    'diff_threshold': 30,
+                    'model_file': 'background_model_{camera}.npz',
+                    'save_interval': 300
+                }
             },
             'video': {
                 'source': 'parking_lot.mp4',  # or 0 for webcam
                 'fps': 30,
                 'resize_width': 640,
-                'resize_height': 480
+                'resize_height': 480,
+                'capture_policy': 'auto',  # 'auto', 'latest' or 'lossless'
+                'queue_size': 2,
+                'scheduler': {
+                    'enabled': True,
+                    'idle_fps': 2,
+                    'active_fps': 15,
+                    'idle_after': 10,
+                    'cpu_budget': None  # share of one CPU core, None for no limit
+                }
+            },
+            'shared_memory': {
+                'enabled': False,
+                'name': 'pms_feed_{camera}',
+                'capacity': 4
+            },
+            'metrics': {
+                'enabled': False,
+                'host': '127.0.0.1',
+                'port': DEFAULT_PORT
+            },
+            'reload': {
+                'watch': True,
+                'interval': 2
             },
             'parking_slots': [
                 {'id': 'A1', 'coords': [60, 0, 150, 57], 'zone': 'A'},
@@ -116,6 +238,153 @@ class ParkingDetector:
             ]
         }
 
+    def configure_detection(self, previous=None):
+        """Build the slot table and the per-slot detection stages from ``self.config``.
+        
+        On a reload ``previous`` holds the stages being replaced: slots whose
+        id and coordinates did not change keep their raw state, votes and
+        committed state, and the learned background carries over.
+        """
+        detection = self.config['detection']
+        
+        # Detection parameters
+        self.occupancy_threshold = detection['occupancy_threshold']
+        # Keep-alive period for unchanged slots (older configs call it update_interval)
+        self.heartbeat_interval = detection.get('heartbeat_interval', detection.get('update_interval', 30))
+        self.detection_method = detection['method']
+        
+        # Parking slots configuration, compiled into arrays indexed by slot
+        self.parking_slots = self.config['parking_slots']
+        self.slots = SlotTable(self.parking_slots)
+        
+        # Whole-frame edge engine shared by all slots
+        self.engine = OccupancyEngine(self.slots.rects)
+        
+        # Cheap per-slot change detection; unchanged slots skip the detectors
+        motion_gate = detection.get('motion_gate', {})
+        self.motion_gate = None
+        if motion_gate.get('enabled', True):
+            self.motion_gate = MotionGate(
+                self.slots.rects,
+                downscale=motion_gate.get('downscale', 4),
+                pixel_threshold=motion_gate.get('pixel_threshold', 15),
+                change_ratio=motion_gate.get('change_ratio', 0.02),
+                refresh_interval=motion_gate.get('refresh_interval', 10)
+            )
+        self.raw_states = np.zeros(len(self.slots), dtype=bool)
+        
+        # Raw detections pass an N-of-M vote before a change is committed
+        self.debouncer = SlotDebouncer(
+            len(self.slots),
+            window=detection.get('debounce_window', 5),
+            votes=detection.get('debounce_votes', 4)
+        )
+        
+        # Full-frame background model, read out per slot
+        background = detection.get('background', {})
+        model_file = background.get('model_file', 'background_model_{camera}.npz')
+        self.background = BackgroundModel(
+            self.slots.rects,
+            learning_rate=background.get('learning_rate', 0.005),
+            occupied_learning_rate=background.get('occupied_learning_rate', 0.0002),
+            diff_threshold=background.get('diff_threshold', 30),
+            min_foreground=detection.get('min_contour_area', 500),
+            model_file=model_file.format(camera=self.camera_id) if model_file else None
+        )
+        self.background_save_interval = background.get('save_interval', 300)
+        
+        if previous is not None:
+            kept, previous_kept = [], []
+            for index, slot_id in enumerate(self.slots.ids):
+                old_index = previous['slots'].index.get(slot_id)
+                if old_index is not None and self.slots.coords(index) == previous['slots'].coords(old_index):
+                    kept.append(index)
+                    previous_kept.append(old_index)
+            
+            self.raw_states[kept] = previous['raw_states'][previous_kept]
+            self.debouncer.adopt(previous['debouncer'], kept, previous_kept)
+            if not self.background.adopt(previous['background']) and self.detection_method in ('background', 'hybrid'):
+                self.background.load()
+            logger.info(f"Slot layout: {len(kept)} of {len(self.slots)} slots kept their state")
+        
+        self.slot_states = self.debouncer.state
+
+    def config_file_mtime(self):
+        if not self.config_file:
+            return None
+        try:
+            return os.stat(self.config_file).st_mtime
+        except OSError:
+            return None
+
+    def request_reload(self, *args):
+        """Ask for the config to be re-read before the next frame (SIGHUP handler)"""
+        self.reload_requested = True
+
+    def request_stop(self, *args):
+        """Leave the detection loop after the current frame (SIGTERM handler)"""
+        self.stop_requested = True
+
+    def check_config(self):
+        """Reload the config between frames if requested or if the file changed"""
+        reload = self.config.get('reload', {})
+        if self.config_file and reload.get('watch', True):
+            now = time.monotonic()
+            if now - self.last_config_check >= reload.get('interval', 2):
+                self.last_config_check = now
+                mtime = self.config_file_mtime()
+                if mtime is not None and mtime != self.config_mtime:
+                    self.reload_requested = True
+        
+        if self.reload_requested:
+            self.reload_requested = False
+            self.reload_config()
+
+    def reload_config(self):
+        """Re-read the config file and swap in new slots and thresholds.
+        
+        Either the whole detection config is applied or, if anything in it
+        is invalid, none of it. Capture, publishing and shared memory keep
+        running; changes to those sections need a restart.
+        """
+        if not self.config_file:
+            return False
+        self.config_mtime = self.config_file_mtime()
+        
+        try:
+            with open(self.config_file, 'r') as f:
+                config = yaml.safe_load(f)
+            if self.camera_filter is not None:
+                config = apply_camera(config, self.camera_filter)
+        except (OSError, yaml.YAMLError, KeyError, TypeError, ValueError) as e:
+            logger.error(f"Config reload failed, keeping the current config: {e}")
+            return False
+        
+        previous_config = self.config
+        loaded_config = copy.deepcopy(config)
+        previous = {name: getattr(self, name) for name in DETECTION_ATTRIBUTES}
+        try:
+            self.config = config
+            self.configure_detection(previous)
+        except (KeyError, TypeError, ValueError) as e:
+            # Put every stage back as it was
+            for name, value in previous.items():
+                setattr(self, name, value)
+            self.config = previous_config
+            logger.error(f"Config reload failed, keeping the current config: {e}")
+            return False
+        
+        for section in RESTART_SECTIONS:
+            if loaded_config.get(section) != self.loaded_config.get(section):
+                logger.warning(f"Config section '{section}' changed; it takes effect after a restart")
+            # Keep running with what was actually started
+            self.config[section] = previous_config.get(section)
+        self.loaded_config = loaded_config
+        
+        logger.info(f"Config reloaded from {self.config_file} ({len(self.slots)} slots, "
+                    f"method {self.detection_method}, threshold {self.occupancy_threshold})")
+        return True
+
     def initialize_video_capture(self):
         """Initialize video capture"""
         video_source = self.config['video']['source']
@@ -135,153 +404,306 @@ class ParkingDetector:
         # Set video properties
         self.cap.set(cv2.CAP_PROP_FPS, self.config['video']['fps'])
         
-        logger.info(f"Video capture initialized: {video_source}")
+        policy = self.config['video'].get('capture_policy', 'auto')
+        if policy == 'auto':
+            policy = default_policy(video_source)
+        
+        if policy == 'latest':
+            # Keep the driver from queueing stale frames behind ours
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        
+        # Process fewer frames while the lot is idle
+        self.scheduler = FrameScheduler.from_config(
+            self.config['video'].get('scheduler'),
+            source_fps=self.cap.get(cv2.CAP_PROP_FPS) or self.config['video']['fps']
+        )
+        if self.scheduler is not None and policy == 'lossless':
+            logger.warning(
+                "Frame scheduler enabled with the lossless capture policy: frames outside "
+                "the scheduled rate are skipped (set video.scheduler.enabled: false to process every frame)"
+            )
+        
+        self.capture = FrameCapture(
+            self.cap,
+            policy=policy,
+            max_queue=self.config['video'].get('queue_size', 2),
+            rewind=not isinstance(video_source, int),
+            scheduler=self.scheduler,
+            pace=policy == 'lossless'
+        )
+        
+        logger.info(f"Video capture initialized: {video_source} (policy: {policy})")
         return True
 
-    def detect_occupancy_edge(self, slot_roi):
-        """Edge detection based occupancy detection"""
-        gray = cv2.cvtColor(slot_roi, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 50, 150)
-        non_zero = cv2.countNonZero(edges)
-        total_pixels = slot_roi.shape[0] * slot_roi.shape[1]
-        ratio = non_zero / total_pixels
-        return ratio > self.occupancy_threshold
-
-    def detect_occupancy_background(self, slot_roi):
-        """Background subtraction based occupancy detection"""
-        fg_mask = self.bg_subtractor.apply(slot_roi)
+    def detect_occupancy_frame(self, frame):
+        """Detect occupancy of every slot in a frame at once.
         
-        # Remove noise
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
+        Slots the motion gate considers unchanged keep their last raw state.
+        """
+        method = self.detection_method
+        if method not in ('edge', 'background', 'hybrid'):
+            logger.warning(f"Unknown detection method: {method}, using edge detection")
+            method = 'edge'
         
-        # Find contours
-        contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        gray = self.engine.grayscale(frame)
+        now = time.time()
         
-        # Check if any significant contour exists
-        for contour in contours:
-            if cv2.contourArea(contour) > self.config['detection']['min_contour_area']:
-                return True
+        active = None
+        if self.motion_gate is not None:
+            active = self.motion_gate.update(gray, now)
+            if not active.any():
+                return self.raw_states.copy()
         
-        return False
-
-    def detect_occupancy_hybrid(self, slot_roi):
-        """Hybrid detection combining edge and background subtraction"""
-        edge_result = self.detect_occupancy_edge(slot_roi)
-        bg_result = self.detect_occupancy_background(slot_roi)
+        occupied = np.zeros(len(self.slots), dtype=bool)
         
-        # Use OR logic - if either method detects occupancy, consider it occupied
-        return edge_result or bg_result
-
-    def detect_occupancy(self, slot_roi):
-        """Main occupancy detection method"""
-        method = self.detection_method
+        # Edge density for all slots comes from one pass over the frame
+        if method in ('edge', 'hybrid'):
+            occupied |= self.engine.process_gray(gray, active) > self.occupancy_threshold
+        
+        # Foreground pixels per slot from one full-frame background model
+        if method in ('background', 'hybrid'):
+            occupied |= self.background.occupied(gray, self.slot_states)
+            
+            if now - self.last_background_save > self.background_save_interval:
+                self.save_background()
         
-        if method == 'edge':
-            return self.detect_occupancy_edge(slot_roi)
-        elif method == 'background':
-            return self.detect_occupancy_background(slot_roi)
-        elif method == 'hybrid':
-            return self.detect_occupancy_hybrid(slot_roi)
+        if active is None:
+            self.raw_states[:] = occupied
         else:
-            logger.warning(f"Unknown detection method: {method}, using edge detection")
-            return self.detect_occupancy_edge(slot_roi)
+            np.copyto(self.raw_states, occupied, where=active)
+            self.motion_gate.commit(np.flatnonzero(active), now)
+        
+        return self.raw_states.copy()
 
-    def send_slot_update(self, slot_id, is_occupied):
-        """Send slot status update to Django API with retry logic"""
+    def save_background(self):
+        """Persist the background model so a restart skips the warm-up"""
+        self.last_background_save = time.time()
+        try:
+            if self.background.save():
+                logger.debug(f"Background model saved to {self.background.model_file}")
+        except OSError as e:
+            logger.error(f"Failed to save background model: {e}")
+
+    def send_slot_update(self, slot_id, is_occupied, timestamp=None, camera_id=None,
+                         captured_at=None, frame_id=None):
+        """Send one slot status update to the Django API (retries are the publisher's job)"""
         data = {
             "slot_id": slot_id,
             "is_occupied": is_occupied,
-            "timestamp": datetime.now().isoformat(),
-            "detector_id": "opencv_enhanced"
+            "timestamp": timestamp or datetime.now().isoformat(),
+            "detector_id": "opencv_enhanced",
+            "camera_id": camera_id or self.camera_id,
+            "captured_at": captured_at,
+            "frame_id": frame_id
         }
         
-        for attempt in range(self.config['api']['retry_attempts']):
-            try:
-                response = self.session.post(self.update_endpoint, json=data)
-                
-                if response.status_code == 200:
-                    logger.debug(f"Successfully updated slot {slot_id}: {'Occupied' if is_occupied else 'Vacant'}")
-                    return True
-                else:
-                    logger.warning(f"API returned status {response.status_code} for slot {slot_id}: {response.text}")
-                    
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Attempt {attempt + 1} failed for slot {slot_id}: {e}")
-                
-                if attempt < self.config['api']['retry_attempts'] - 1:
-                    time.sleep(self.config['api']['retry_delay'])
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.update_endpoint, json=data,
+                                         timeout=self.config['api']['timeout'])
+        except requests.exceptions.RequestException as e:
+            self.metrics.api_request(time.perf_counter() - start, ok=False)
+            logger.error(f"Update failed for slot {slot_id}: {e}")
+            return False
         
-        logger.error(f"Failed to update slot {slot_id} after {self.config['api']['retry_attempts']} attempts")
-        return False
-
-    def send_async_update(self, slot_id, is_occupied):
-        """Send update in background thread"""
-        def task():
-            self.send_slot_update(slot_id, is_occupied)
+        self.metrics.api_request(time.perf_counter() - start, ok=response.status_code == 200)
+        if response.status_code != 200:
+            logger.warning(f"API returned status {response.status_code} for slot {slot_id}: {response.text}")
+            return False
         
-        threading.Thread(target=task, daemon=True).start()
+        logger.debug(f"Successfully updated slot {slot_id}: {'Occupied' if is_occupied else 'Vacant'}")
+        if response.json().get('is_reserved'):
+            self.expect_arrival()
+        return True
 
-    def should_update_slot(self, slot_id, is_occupied):
-        """Check if slot status should be updated"""
-        now = time.time()
+    def send_batch_update(self, updates):
+        """Send many slot updates in one request to the batch API"""
+        data = {
+            "detector_id": "opencv_enhanced",
+            "updates": updates
+        }
+        
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.batch_endpoint, json=data,
+                                         timeout=self.config['api']['timeout'])
+        except requests.exceptions.RequestException as e:
+            self.metrics.api_request(time.perf_counter() - start, ok=False)
+            logger.error(f"Batch of {len(updates)} updates failed: {e}")
+            return False
         
-        # Always update if state changed
-        if slot_id in self.slot_states and self.slot_states[slot_id] != is_occupied:
-            return True
+        self.metrics.api_request(time.perf_counter() - start, ok=response.status_code == 200)
+        if response.status_code != 200:
+            logger.warning(f"Batch API returned status {response.status_code}: {response.text}")
+            return False
         
-        # Update periodically even if state hasn't changed
-        if slot_id not in self.last_sent or now - self.last_sent[slot_id] > self.update_interval:
-            return True
+        result = response.json()
+        activated = result.get('auto_activated', 0)
+        if any(item.get('is_reserved') for item in result.get('results', [])):
+            self.expect_arrival()
+        logger.debug(f"Successfully sent batch of {len(updates)} updates ({activated} sessions auto-activated)")
+        return True
+
+    def expect_arrival(self):
+        """A slot is reserved for a pending session: keep the frame rate up until the next heartbeat"""
+        if self.scheduler is not None:
+            self.scheduler.expect_activity(2 * self.heartbeat_interval)
+
+    def publish_updates(self, updates):
+        """Publish a list of update dicts using the configured publish mode.
+        
+        Returns how many leading updates were delivered, so the caller can
+        retry exactly the rest.
+        """
+        if self.publish_mode == 'batch':
+            return len(updates) if self.send_batch_update(updates) else 0
+        
+        # Stop at the first failure so the rest are retried in order
+        for delivered, update in enumerate(updates):
+            if not self.send_slot_update(update['slot_id'], update['is_occupied'],
+                                         timestamp=update.get('timestamp'),
+                                         camera_id=update.get('camera_id'),
+                                         captured_at=update.get('captured_at'),
+                                         frame_id=update.get('frame_id')):
+                return delivered
+        return len(updates)
+
+    def deliver(self, updates):
+        """Hand updates to the outbox if enabled, otherwise to the publisher"""
+        if self.outbox is not None:
+            self.outbox.append(updates)
+        elif self.publisher is not None:
+            self.publisher.submit(updates)
+
+    def metrics_snapshot(self):
+        """Current metrics together with capture, scheduler and publishing stats"""
+        publishing = self.update_queue is None
+        return self.metrics.snapshot(
+            capture=self.capture.stats() if self.capture else None,
+            scheduler=self.scheduler.stats() if self.scheduler else None,
+            publisher=self.publisher.stats() if publishing and self.publisher is not None else None,
+            outbox=self.outbox.stats() if publishing and self.outbox is not None else None
+        )
+
+    def report_metrics(self):
+        """Send a metrics snapshot to the supervisor"""
+        try:
+            self.metrics_queue.put_nowait(self.metrics_snapshot())
+        except Exception as e:
+            logger.debug(f"Could not report metrics: {e}")
+
+    def start_metrics_server(self, port=None, collect=None):
+        """Serve metrics over HTTP; returns the server, or None if it could not start"""
+        metrics = self.config.get('metrics', {})
+        if collect is None:
+            collect = lambda: {'cameras': {self.camera_id: self.metrics_snapshot()}}
+        try:
+            return MetricsServer(collect, port=port or metrics.get('port', DEFAULT_PORT),
+                                 host=metrics.get('host', '127.0.0.1')).start()
+        except OSError as e:
+            logger.error(f"Metrics endpoint disabled: {e}")
+            return None
+
+    def stop_publishing(self):
+        """Deliver what can still be delivered; the outbox keeps the rest on disk"""
+        if self.publisher is not None:
+            self.publisher.stop()
+        if self.outbox is not None:
+            self.outbox.close()
+            self.outbox = None
+
+    def slots_to_update(self, transitions, now):
+        """Return indices of slots to publish: committed transitions plus heartbeats"""
+        if self.outbox is not None and self.outbox.pending:
+            # The backlog carries every slot's latest transition already
+            return transitions
+        if self.heartbeat_interval and now - self.last_heartbeat >= self.heartbeat_interval:
+            # Coalesce every committed slot into one keep-alive
+            self.last_heartbeat = now
+            return np.flatnonzero(self.debouncer.known)
+        return transitions
+
+    def publish_slots(self, indices, now, captured_at=None, frame_id=None):
+        """Publish the committed state of the given slot indices"""
+        if not len(indices):
+            return
         
-        return False
+        # Stamp updates with the frame that decided them, for latency tracing
+        captured_at = captured_at or now
+        timestamp = datetime.fromtimestamp(captured_at).isoformat()
+        updates = [{
+            'slot_id': self.slots.ids[index],
+            'is_occupied': bool(self.slot_states[index]),
+            'timestamp': timestamp,
+            'captured_at': captured_at,
+            'frame_id': frame_id,
+            'camera_id': self.camera_id
+        } for index in indices]
+        if self.update_queue is not None:
+            for update in updates:
+                self.update_queue.put(update)
+        else:
+            self.deliver(updates)
 
-    def process_frame(self, frame):
-        """Process a single frame for parking detection"""
-        # Resize frame if configured
+    def preprocess(self, frame):
+        """Resize a captured frame to the configured working resolution"""
         if 'resize_width' in self.config['video'] and 'resize_height' in self.config['video']:
             frame = cv2.resize(frame, (
                 self.config['video']['resize_width'],
                 self.config['video']['resize_height']
             ))
-        
-        detection_results = []
-        
-        for slot_config in self.parking_slots:
-            slot_id = slot_config['id']
-            x, y, w, h = slot_config['coords']
-            
-            # Extract slot ROI
-            slot_roi = frame[y:y+h, x:x+w]
-            
-            # Detect occupancy
-            is_occupied = self.detect_occupancy(slot_roi)
-            
-            # Update if necessary
-            if self.should_update_slot(slot_id, is_occupied):
-                self.send_async_update(slot_id, is_occupied)
-                self.last_sent[slot_id] = time.time()
-            
-            # Update state tracking
-            self.slot_states[slot_id] = is_occupied
-            
-            # Store result for visualization
-            detection_results.append({
-                'slot_id': slot_id,
-                'coords': (x, y, w, h),
-                'is_occupied': is_occupied,
-                'zone': slot_config.get('zone', 'Unknown')
-            })
-        
-        return detection_results
+        return frame
+
+    def debounce(self, raw):
+        """Vote raw detections into committed states; returns committed transitions"""
+        transitions = self.debouncer.update(raw)
+        self.slot_states = self.debouncer.state
+        
+        if self.scheduler is not None:
+            # Stay at the active rate while slots change or votes are still open
+            activity = transitions.size > 0 or bool((raw != self.slot_states).any())
+            if self.motion_gate is not None:
+                activity = activity or bool(self.motion_gate.changed.any())
+            self.scheduler.record(activity)
+        
+        return transitions
+
+    def publish_transitions(self, transitions, captured_at=None, frame_id=None):
+        """Publish committed transitions, plus heartbeats when due"""
+        now = time.time()
+        self.publish_slots(self.slots_to_update(transitions, now), now, captured_at, frame_id)
+
+    def process_frame(self, frame, captured_at=None, frame_id=None):
+        """Process a single frame for parking detection.
+        
+        Returns the committed (debounced) occupancy vector, indexed like
+        ``self.slots``.
+        """
+        start = time.perf_counter()
+        frame = self.preprocess(frame)
+        self.working_frame = frame
+        preprocessed = time.perf_counter()
+        raw = self.detect_occupancy_frame(frame)
+        detected = time.perf_counter()
+        
+        # Only committed transitions (and heartbeats) are published
+        transitions = self.debounce(raw)
+        debounced = time.perf_counter()
+        self.publish_transitions(transitions, captured_at, frame_id)
+        
+        self.metrics.observe('preprocess', preprocessed - start)
+        self.metrics.observe('detect', detected - preprocessed)
+        self.metrics.observe('debounce', debounced - detected)
+        self.metrics.observe('publish', time.perf_counter() - debounced)
+        self.metrics.frame(captured_at)
+        return self.slot_states.copy()
 
-    def draw_detections(self, frame, detection_results):
+    def draw_detections(self, frame, occupied):
         """Draw detection results on frame"""
-        for result in detection_results:
-            slot_id = result['slot_id']
-            x, y, w, h = result['coords']
-            is_occupied = result['is_occupied']
-            zone = result['zone']
+        for index, slot_id in enumerate(self.slots.ids):
+            x, y, w, h = self.slots.coords(index)
+            is_occupied = occupied[index]
+            zone = self.slots.zone_of(index)
             
             # Choose color based on occupancy
             color = (0, 0, 255) if is_occupied else (0, 255, 0)  # Red for occupied, Green for vacant
@@ -309,29 +731,73 @@ class ParkingDetector:
         cv2.putText(frame, timestamp, (10, frame.shape[0] - 10),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
 
+    def share_frame(self, frame, occupied, captured):
+        """Publish an annotated frame and the slot states to the shared-memory ring"""
+        if not self.shared_memory.get('enabled'):
+            return
+        
+        if self.frame_ring is None or self.frame_ring.shape != frame.shape or self.frame_ring.slot_ids != self.slots.ids:
+            if self.frame_ring is not None:
+                self.frame_ring.close()
+            name = self.shared_memory.get('name', 'pms_feed_{camera}').format(camera=self.camera_id)
+            try:
+                self.frame_ring = FrameRing.create(name, frame.shape, self.slots.ids,
+                                                   capacity=self.shared_memory.get('capacity', 4))
+            except (OSError, ValueError) as e:
+                logger.error(f"Shared memory disabled: could not create frame ring {name}: {e}")
+                self.shared_memory['enabled'] = False
+                self.frame_ring = None
+                return
+        
+        self.frame_ring.publish(frame, occupied, frame_id=captured.frame_id,
+                                captured_at=captured.captured_at, published_at=time.time())
+
     def run(self, show_video=True):
-        """Main detection loop"""
+        """Main detection loop. Returns False if the video source could not be opened."""
         if not self.initialize_video_capture():
-            return
+            return False
         
         logger.info("Starting parking detection...")
+        if self.config_file and hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+            # kill -HUP re-reads the config between frames
+            signal.signal(signal.SIGHUP, self.request_reload)
+        if threading.current_thread() is threading.main_thread():
+            # kill (and the supervisor stopping a worker) ends the loop so cleanup still runs
+            signal.signal(signal.SIGTERM, self.request_stop)
+        self.capture.start()
+        last_status = time.monotonic()
+        last_metrics = 0.0
         
         try:
-            while True:
-                ret, frame = self.cap.read()
-                if not ret:
-                    logger.warning("Failed to read frame, restarting video...")
-                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Restart video
+            while not self.stop_requested:
+                captured = self.capture.read()
+                if captured is None:
                     continue
                 
+                # Config changes are applied between frames only
+                self.check_config()
+                
+                frame = captured.frame
                 self.frame_count += 1
+                self.metrics.observe('queue', time.time() - captured.captured_at)
                 
                 # Process frame
-                detection_results = self.process_frame(frame)
+                occupied = self.process_frame(frame, captured.captured_at, captured.frame_id)
+                
+                # Annotate at the working resolution the slot coordinates refer to
+                if show_video or self.shared_memory.get('enabled'):
+                    start = time.perf_counter()
+                    frame = self.working_frame
+                    self.draw_detections(frame, occupied)
+                    self.share_frame(frame, occupied, captured)
+                    self.metrics.observe('annotate', time.perf_counter() - start)
+                
+                if self.metrics_queue is not None and time.monotonic() - last_metrics >= METRICS_INTERVAL:
+                    last_metrics = time.monotonic()
+                    self.report_metrics()
                 
                 # Draw results if video display is enabled
                 if show_video:
-                    self.draw_detections(frame, detection_results)
                     cv2.imshow('Enhanced Parking Detection', frame)
                     
                     # Check for quit key
@@ -339,10 +805,26 @@ class ParkingDetector:
                         break
                 
                 # Log status periodically
-                if self.frame_count % 300 == 0:  # Every 10 seconds at 30 FPS
-                    occupied_count = sum(1 for r in detection_results if r['is_occupied'])
-                    total_slots = len(detection_results)
-                    logger.info(f"Status: {occupied_count}/{total_slots} slots occupied")
+                if time.monotonic() - last_status >= 10:
+                    last_status = time.monotonic()
+                    occupied_count = int(occupied.sum())
+                    total_slots = len(occupied)
+                    stats = self.capture.stats()
+                    logger.info(
+                        f"Status: {occupied_count}/{total_slots} slots occupied | "
+                        f"queue {stats['queue_depth']}/{stats['queue_size']}, "
+                        f"dropped {stats['frames_dropped']} of {stats['frames_captured']} frames, "
+                        f"skipped {stats['frames_skipped']}"
+                    )
+                    if self.scheduler is not None:
+                        logger.info(f"Scheduler: {self.scheduler.stats()}")
+                    if self.publisher is not None:
+                        logger.info(f"Publisher: {self.publisher.stats()}")
+                    if self.outbox is not None:
+                        logger.info(f"Outbox: {self.outbox.stats()}")
+        
+            if self.stop_requested:
+                logger.info("Detection stopped")
         
         except KeyboardInterrupt:
             logger.info("Detection stopped by user")
@@ -352,8 +834,16 @@ class ParkingDetector:
 
     def cleanup(self):
         """Cleanup resources"""
+        if self.capture:
+            self.capture.stop()
+        self.stop_publishing()
+        if self.detection_method in ('background', 'hybrid'):
+            self.save_background()
         if self.cap:
             self.cap.release()
+        if self.frame_ring:
+            self.frame_ring.close()
+            self.frame_ring = None
         cv2.destroyAllWindows()
         logger.info("Cleanup completed")
 
@@ -363,11 +853,54 @@ def main():
                        help='Configuration file path')
     parser.add_argument('--no-video', action='store_true',
                        help='Run without video display')
+    parser.add_argument('--capture-policy', choices=['auto', 'latest', 'lossless'],
+                       help='Frame drop policy (default: from config)')
+    parser.add_argument('--camera', action='append', dest='cameras',
+                       help='Only run this camera id (repeatable, default: all declared cameras)')
+    parser.add_argument('--metrics-port', type=int,
+                       help='Serve metrics on this port (default: off unless enabled in the config)')
     
     args = parser.parse_args()
     
     detector = ParkingDetector(args.config)
-    detector.run(show_video=not args.no_video)
+    if args.capture_policy:
+        detector.config['video']['capture_policy'] = args.capture_policy
+    serve_metrics = args.metrics_port or detector.config.get('metrics', {}).get('enabled')
+    metrics_server = None
+    
+    # Several cameras: one worker process each, publishing through this process
+    cameras = args.cameras or [str(camera['id']) for camera in camera_configs(detector.config)]
+    if len(cameras) > 1 or cameras[0] != DEFAULT_CAMERA_ID:
+        supervisor = DetectorSupervisor(
+            ParkingDetector,
+            args.config,
+            detector.config,
+            camera_ids=cameras,
+            show_video=not args.no_video,
+            publish=detector.deliver,
+            capture_policy=args.capture_policy
+        )
+        if serve_metrics:
+            metrics_server = detector.start_metrics_server(args.metrics_port, collect=lambda: {
+                'cameras': supervisor.camera_metrics(),
+                'workers': supervisor.status(),
+                'publishing': detector.metrics_snapshot()
+            })
+        try:
+            supervisor.run()
+        finally:
+            detector.stop_publishing()
+            if metrics_server:
+                metrics_server.stop()
+        return
+    
+    if serve_metrics:
+        metrics_server = detector.start_metrics_server(args.metrics_port)
+    try:
+        detector.run(show_video=not args.no_video)
+    finally:
+        if metrics_server:
+            metrics_server.stop()
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ParkingSlot, ParkingSession, UserProfile, LoginAttempt, PasswordResetRequest, Booking, SystemSettings
+from .models import ParkingSlot, ParkingSession, UserProfile, LoginAttempt, PasswordResetRequest, Booking, SystemSettings, lot_changed
 
 
 @admin.register(SystemSettings)
@@ -78,7 +78,9 @@ class ParkingSessionAdmin(admin.ModelAdmin):
     
     def mark_as_completed(self, request, queryset):
         """Mark selected sessions as completed"""
+        slot_ids = list(queryset.values_list('slot_id', flat=True))
         updated = queryset.update(status='completed')
+        lot_changed(slot_ids)
         self.message_user(request, f'Marked {updated} session(s) as completed.')
     mark_as_completed.short_description = 'Mark selected as completed'
     
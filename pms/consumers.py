@@ -0,0 +1,49 @@
+"""
+WebSocket consumers for live dashboards.
+
+    ws/lot/           every slot in the lot
+    ws/lot/<zone>/    only the slots of one zone (e.g. ws/lot/A/)
+
+Any logged-in user may subscribe, like /api/slot-status/. Staff and
+managers also receive session and booking events; customers receive
+events for their own bookings. The first message is a ``hello`` with the
+current lot version, so a client can fetch what it missed from
+/api/slot-status/changes/?since=<version> after a reconnect.
+"""
+
+from asgiref.sync import async_to_sync
+from channels.generic.websocket import JsonWebsocketConsumer
+
+from . import realtime
+from .models import LOT_STATE, StateVersion
+from .permissions import user_has_role
+
+
+class LotConsumer(JsonWebsocketConsumer):
+    def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            self.close()
+            return
+
+        zone = self.scope['url_route']['kwargs'].get('zone')
+        self.groups = [realtime.zone_group(zone) if zone else realtime.LOT_GROUP, realtime.user_group(user.pk)]
+        if user_has_role(user, ['staff', 'manager']):
+            self.groups.append(realtime.STAFF_GROUP)
+
+        # The base class leaves these groups again on disconnect
+        for group in self.groups:
+            async_to_sync(self.channel_layer.group_add)(group, self.channel_name)
+        self.accept()
+        self.send_json({
+            'type': 'hello',
+            'version': StateVersion.current(LOT_STATE),
+            'zone': zone.upper() if zone else None,
+        })
+
+    def receive_json(self, content, **kwargs):
+        if content.get('type') == 'ping':
+            self.send_json({'type': 'pong'})
+
+    def lot_event(self, event):
+        self.send_json(event['payload'])
@@ -7,6 +7,7 @@ from django.db.models import Count, Q, Sum
 from .models import ParkingSlot, ParkingSession, UserProfile, LoginAttempt, Vehicle
 from .forms import VehicleForm
 from .permissions import require_manager, require_staff_or_manager, require_customer, require_approved_user
+from .etags import conditional, analytics_etag, lot_etag
 import json
 
 
@@ -271,6 +272,7 @@ def navbar(request):
 
 # API endpoints for dashboard analytics
 @require_approved_user
+@conditional(analytics_etag)
 def dashboard_analytics_api(request):
     """API endpoint for dashboard analytics"""
     
@@ -318,6 +320,7 @@ def dashboard_analytics_api(request):
 
 
 @require_approved_user
+@conditional(lot_etag)
 def live_stats_api(request):
     """API endpoint for live statistics"""
     
@@ -0,0 +1,52 @@
+"""
+ETag validators for the polled dashboard APIs.
+
+Each validator is built from StateVersion counters, so checking it costs
+one small query and runs before the view's own queries. When the client's
+If-None-Match still matches, the view is skipped and a bodyless 304 goes
+out. Versions are bumped after the write commits, so a response can only
+ever be newer than its tag, never older.
+
+Validators return None for anonymous users, which turns the check off and
+leaves the view to refuse the request.
+"""
+
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag
+
+from .models import LOT_STATE, USER_PROFILES_STATE, StateVersion
+
+
+def conditional(etag_func):
+    """ETag/304 handling, with headers that make browsers revalidate every poll"""
+    def decorator(view_func):
+        return cache_control(private=True, no_cache=True)(etag(etag_func)(view_func))
+    return decorator
+
+
+def slot_status_etag(request, *args, **kwargs):
+    # The snapshot also moves with the clock (see slot_status), once a minute
+    if not request.user.is_authenticated:
+        return None
+    minute = int(timezone.now().timestamp() // 60)
+    return f"slot-status-{StateVersion.current(LOT_STATE)}-{minute}"
+
+
+def lot_etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    return f"lot-{StateVersion.current(LOT_STATE)}"
+
+
+def analytics_etag(request, *args, **kwargs):
+    # Today's session and revenue figures start over at midnight
+    if not request.user.is_authenticated:
+        return None
+    return f"analytics-{StateVersion.current(LOT_STATE)}-{timezone.now().date().isoformat()}"
+
+
+def user_profiles_etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return None
+    return f"profiles-{StateVersion.current(USER_PROFILES_STATE)}"
@@ -0,0 +1,93 @@
+"""
+Capture-to-commit and capture-to-visible latency per camera.
+
+Detector updates carry the capture time and frame id of the frame that
+decided them. When an update changes a slot, the time from capture to the
+database commit is recorded for the camera that sent it. The slot then
+waits until a status API response includes it; the time from capture to
+that first response is the capture-to-visible latency.
+
+Histograms are kept per process, like the rest of the in-memory state the
+API serves (see slot_cache), and reset on restart.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from detector.latency import LatencyHistogram
+
+
+def parse_captured_at(update):
+    """Capture time of an update as epoch seconds, or None.
+
+    Prefers the numeric ``captured_at``; falls back to the ISO ``timestamp``
+    (naive timestamps are the detector host's local time).
+    """
+    value = update.get('captured_at')
+    if value is not None:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    timestamp = update.get('timestamp')
+    if not timestamp:
+        return None
+    try:
+        return datetime.fromisoformat(str(timestamp)).timestamp()
+    except ValueError:
+        return None
+
+
+class LatencyTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.last_frame = {}
+        self._unseen = {}
+
+    def _histogram(self, camera_id, stage):
+        key = (camera_id, stage)
+        if key not in self.histograms:
+            self.histograms[key] = LatencyHistogram()
+        return self.histograms[key]
+
+    def committed(self, slot_id, camera_id, captured_at, frame_id=None):
+        """Record a committed slot change; call from transaction.on_commit"""
+        if captured_at is None:
+            return
+        now = time.time()
+        camera_id = str(camera_id or 'default')
+        with self._lock:
+            self._histogram(camera_id, 'capture_to_commit').add(now - captured_at)
+            self._unseen[slot_id] = (camera_id, captured_at)
+            if frame_id is not None:
+                self.last_frame[camera_id] = {'frame_id': frame_id, 'captured_at': captured_at}
+
+    def served(self, slot_ids=None):
+        """A status response went out; record visibility of the slots it included"""
+        if not self._unseen:
+            return
+        now = time.time()
+        with self._lock:
+            for slot_id in list(self._unseen) if slot_ids is None else slot_ids:
+                seen = self._unseen.pop(slot_id, None)
+                if seen is not None:
+                    camera_id, captured_at = seen
+                    self._histogram(camera_id, 'capture_to_visible').add(now - captured_at)
+
+    def snapshot(self):
+        with self._lock:
+            cameras = {}
+            for (camera_id, stage), histogram in sorted(self.histograms.items()):
+                cameras.setdefault(camera_id, {})[stage] = histogram.to_dict()
+            for camera_id, frame in self.last_frame.items():
+                cameras.setdefault(camera_id, {})['last_frame'] = frame
+            return {
+                'cameras': cameras,
+                'awaiting_visibility': len(self._unseen),
+            }
+
+
+tracker = LatencyTracker()
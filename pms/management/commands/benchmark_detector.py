@@ -0,0 +1,184 @@
+"""
+Django management command to benchmark the parking detector offline
+Usage: python manage.py benchmark_detector [options]
+
+Replays a recorded video through ParkingDetector headless, as fast as
+possible, with the API stubbed out, and writes per-stage timings to JSON.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from datetime import datetime
+from pathlib import Path
+import json
+import logging
+import platform
+import time
+
+from detector.replay import (
+    StubSession, git_revision, parse_resolution, read_frames, replay_config, summarize
+)
+
+METHODS = ('edge', 'background', 'hybrid')
+STAGES = ('decode', 'preprocess', 'detect', 'publish')
+
+
+class Command(BaseCommand):
+    help = 'Replay a video through the parking detector and report throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--config',
+            type=str,
+            default='detector_config.yaml',
+            help='Path to detector configuration file'
+        )
+        parser.add_argument(
+            '--video',
+            type=str,
+            help='Video file to replay (default: video source from the config)'
+        )
+        parser.add_argument(
+            '--method',
+            action='append',
+            dest='methods',
+            choices=METHODS,
+            help='Detection method to benchmark (repeatable, default: all)'
+        )
+        parser.add_argument(
+            '--resolution',
+            action='append',
+            dest='resolutions',
+            help='Working resolution as WIDTHxHEIGHT (repeatable, default: from the config)'
+        )
+        parser.add_argument(
+            '--frames',
+            type=int,
+            help='Only replay the first N frames'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=10,
+            help='Frames excluded from the statistics at the start of each run (default: 10)'
+        )
+        parser.add_argument(
+            '--no-motion-gate',
+            action='store_true',
+            help='Run the detectors on every slot of every frame'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='benchmark_results.json',
+            help='Where to write the JSON results (default: benchmark_results.json)'
+        )
+
+    def handle(self, *args, **options):
+        # Imported here so Django can load the command without OpenCV installed
+        from opencv_enhanced_detector import ParkingDetector
+
+        # Per-frame detector logging would dominate the timings
+        for name in ('opencv_enhanced_detector', 'detector'):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        # Only read the config: a live detector would open the production
+        # outbox (and send its backlog) and load the background model
+        base_config = ParkingDetector.load_config(options['config'])
+        video = options['video'] or str(base_config['video']['source'])
+        if not Path(video).exists():
+            raise CommandError(f"Video not found: {video}")
+
+        try:
+            resolutions = [parse_resolution(value) for value in options['resolutions'] or []]
+        except ValueError as e:
+            raise CommandError(str(e))
+        if not resolutions:
+            resolutions = [(base_config['video'].get('resize_width', 640),
+                            base_config['video'].get('resize_height', 480))]
+
+        runs = []
+        for resolution in resolutions:
+            for method in options['methods'] or METHODS:
+                run = self.benchmark(ParkingDetector, base_config, video, method, resolution, options)
+                runs.append(run)
+                self.stdout.write(
+                    f"{method:>10} {resolution[0]}x{resolution[1]}: "
+                    f"{run['fps']:.1f} FPS, latency p50 {run['latency']['p50_ms']:.2f} ms, "
+                    f"p95 {run['latency']['p95_ms']:.2f} ms, p99 {run['latency']['p99_ms']:.2f} ms"
+                )
+
+        results = {
+            'created_at': datetime.now().isoformat(),
+            'revision': git_revision(settings.BASE_DIR),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'video': video,
+            'config': options['config'],
+            'motion_gate': not options['no_motion_gate'],
+            'runs': runs,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(runs)} benchmark runs to {options['output']}"))
+
+    def benchmark(self, detector_class, base_config, video, method, resolution, options):
+        """Replay the video once with one method at one resolution"""
+        config = replay_config(base_config, method=method, resolution=resolution,
+                               motion_gate=not options['no_motion_gate'])
+        detector = detector_class(config=config)
+        session = StubSession()
+        detector.session = session
+
+        timings = {stage: [] for stage in STAGES}
+        latencies = []
+        transitions_published = 0
+        replayed = 0
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        for index, decode_time, frame in read_frames(video, options['frames']):
+            start = time.perf_counter()
+            captured_at = time.time() - decode_time
+            frame = detector.preprocess(frame)
+            preprocessed = time.perf_counter()
+            raw = detector.detect_occupancy_frame(frame)
+            transitions = detector.debounce(raw)
+            detected = time.perf_counter()
+            detector.publish_transitions(transitions, captured_at, index)
+            published = time.perf_counter()
+            replayed += 1
+
+            if index < options['warmup']:
+                continue
+
+            transitions_published += len(transitions)
+            stage_times = (decode_time, preprocessed - start, detected - preprocessed, published - detected)
+            for stage, elapsed in zip(STAGES, stage_times):
+                timings[stage].append(elapsed)
+            latencies.append(sum(stage_times))
+
+        # Wait for queued updates so the request count is complete
+        detector.stop_publishing()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        frames = len(latencies)
+        if not frames:
+            raise CommandError(f"No frames left to measure in {video} after {options['warmup']} warm-up frames")
+
+        return {
+            'method': method,
+            'resolution': list(resolution),
+            'slots': len(detector.slots),
+            'frames': frames,
+            'fps': round(frames / sum(latencies), 2),
+            'wall_seconds': round(wall, 3),
+            'cpu_ms_per_frame': round(cpu / replayed * 1000.0, 4),
+            'transitions': transitions_published,
+            'api_requests': session.requests,
+            'latency': summarize(latencies),
+            # Capture until the request leaves for the API (the replay has no database)
+            'capture_to_request': session.latency.to_dict(),
+            'stages': {stage: summarize(samples) for stage, samples in timings.items()},
+        }
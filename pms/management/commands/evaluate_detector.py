@@ -0,0 +1,182 @@
+"""
+Django management command to score the parking detector against labels
+Usage: python manage.py evaluate_detector [options]
+
+Replays a labelled video through ParkingDetector once per detection method
+(and occupancy threshold) with the API stubbed out, and reports precision
+and recall per slot next to the CPU time spent per frame.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from datetime import datetime
+from pathlib import Path
+import json
+import logging
+import time
+
+from detector.labels import ConfusionCounts, GroundTruth
+from detector.replay import StubSession, read_frames, replay_config
+
+METHODS = ('edge', 'background', 'hybrid')
+
+
+class Command(BaseCommand):
+    help = 'Evaluate detection methods against ground-truth slot labels'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--config',
+            type=str,
+            default='detector_config.yaml',
+            help='Path to detector configuration file'
+        )
+        parser.add_argument(
+            '--labels',
+            type=str,
+            default='parking_lot_labels.yaml',
+            help='Ground-truth labels file (default: parking_lot_labels.yaml)'
+        )
+        parser.add_argument(
+            '--video',
+            type=str,
+            help='Video to replay (default: the video named in the labels file)'
+        )
+        parser.add_argument(
+            '--method',
+            action='append',
+            dest='methods',
+            choices=METHODS,
+            help='Detection method to evaluate (repeatable, default: all)'
+        )
+        parser.add_argument(
+            '--threshold',
+            action='append',
+            dest='thresholds',
+            type=float,
+            help='Edge occupancy_threshold to try (repeatable, default: from the config)'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            help='Frames left out of scoring while the debouncer fills (default: debounce window)'
+        )
+        parser.add_argument(
+            '--no-motion-gate',
+            action='store_true',
+            help='Run the detectors on every slot of every frame'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Also write the full results as JSON to this file'
+        )
+
+    def handle(self, *args, **options):
+        # Imported here so Django can load the command without OpenCV installed
+        from opencv_enhanced_detector import ParkingDetector
+
+        for name in ('opencv_enhanced_detector', 'detector'):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        try:
+            truth = GroundTruth.load(options['labels'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not load labels from {options['labels']}: {e}")
+
+        video = options['video'] or truth.video
+        if not video or not Path(video).exists():
+            raise CommandError(f"Video not found: {video}")
+
+        # Only read the config: a live detector would open the production
+        # outbox (and send its backlog) and load the background model
+        base_config = ParkingDetector.load_config(options['config'])
+        thresholds = options['thresholds'] or [base_config['detection']['occupancy_threshold']]
+        warmup = options['warmup']
+        if warmup is None:
+            warmup = base_config['detection'].get('debounce_window', 5)
+
+        runs = []
+        for method in options['methods'] or METHODS:
+            # The threshold only affects the edge detector
+            for threshold in (thresholds if method != 'background' else thresholds[:1]):
+                config = replay_config(base_config, method=method,
+                                       motion_gate=not options['no_motion_gate'])
+                config['detection']['occupancy_threshold'] = threshold
+                run = self.evaluate(ParkingDetector(config=config), truth, video, warmup)
+                run.update(method=method, occupancy_threshold=threshold)
+                runs.append(run)
+
+        self.report(runs)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'created_at': datetime.now().isoformat(),
+                    'video': video,
+                    'labels': options['labels'],
+                    'config': options['config'],
+                    'motion_gate': not options['no_motion_gate'],
+                    'warmup': warmup,
+                    'runs': runs,
+                }, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(runs)} evaluation runs to {options['output']}"))
+
+    def evaluate(self, detector, truth, video, warmup):
+        """Replay the video once and score raw and committed states"""
+        detector.session = StubSession()
+        slot_ids = detector.slots.ids
+        raw_counts = ConfusionCounts(len(slot_ids))
+        committed_counts = ConfusionCounts(len(slot_ids))
+
+        cpu = 0.0
+        frames = 0
+        scored = 0
+        for index, decode_time, frame in read_frames(video):
+            start = time.process_time()
+            raw = detector.detect_occupancy_frame(detector.preprocess(frame))
+            detector.debounce(raw)
+            cpu += time.process_time() - start
+            frames += 1
+
+            if index < warmup:
+                continue
+            labelled, occupied = truth.states(index, slot_ids)
+            if labelled.any():
+                raw_counts.add(raw, labelled, occupied)
+                committed_counts.add(detector.slot_states, labelled, occupied)
+                scored += 1
+
+        if not scored:
+            raise CommandError("No labelled frames were scored; do the labels match the video and slot ids?")
+
+        return {
+            'frames': frames,
+            'scored_frames': scored,
+            'cpu_ms_per_frame': round(cpu / frames * 1000.0, 4),
+            'raw': raw_counts.overall(),
+            'committed': committed_counts.overall(),
+            'slots': committed_counts.per_slot(slot_ids),
+        }
+
+    def report(self, runs):
+        def fmt(value):
+            return '   -' if value is None else f"{value:.2f}"
+
+        self.stdout.write(f"{'method':>10} {'thresh':>6} {'cpu ms':>7} {'prec':>5} {'recall':>6} {'f1':>5}  raw prec/recall")
+        for run in runs:
+            committed, raw = run['committed'], run['raw']
+            self.stdout.write(
+                f"{run['method']:>10} {run['occupancy_threshold']:>6.3f} {run['cpu_ms_per_frame']:>7.2f} "
+                f"{fmt(committed['precision']):>5} {fmt(committed['recall']):>6} {fmt(committed['f1']):>5}  "
+                f"{fmt(raw['precision'])}/{fmt(raw['recall'])}"
+            )
+
+        for run in runs:
+            self.stdout.write(f"\n{run['method']} (threshold {run['occupancy_threshold']}) per slot:")
+            for slot_id, scores in run['slots'].items():
+                if scores['tp'] + scores['fp'] + scores['fn'] + scores['tn'] == 0:
+                    continue
+                self.stdout.write(
+                    f"  {slot_id:>6}: precision {fmt(scores['precision'])}, recall {fmt(scores['recall'])} "
+                    f"(tp {scores['tp']}, fp {scores['fp']}, fn {scores['fn']}, tn {scores['tn']})"
+                )
@@ -5,13 +5,19 @@ Usage: python manage.py run_detector [options]
 
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
+import json
 import os
 import sys
 import subprocess
 import signal
 import time
+import urllib.request
 from pathlib import Path
 
+import yaml
+
+from detector.metrics import DEFAULT_PORT
+
 class Command(BaseCommand):
     help = 'Run the enhanced OpenCV parking detector'
 
@@ -27,6 +33,12 @@ class Command(BaseCommand):
             action='store_true',
             help='Run detector without video display (headless mode)'
         )
+        parser.add_argument(
+            '--camera',
+            action='append',
+            dest='cameras',
+            help='Camera id from the config to run (repeatable, default: all declared cameras)'
+        )
         parser.add_argument(
             '--daemon',
             action='store_true',
@@ -42,6 +54,17 @@ class Command(BaseCommand):
             action='store_true',
             help='Check detector daemon status'
         )
+        parser.add_argument(
+            '--reload',
+            action='store_true',
+            help='Make the running daemon re-read its configuration file'
+        )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            help='Serve detector metrics on this port; --status reads them from it '
+                 '(default: metrics.port from the config)'
+        )
 
     def handle(self, *args, **options):
         detector_script = Path(__file__).parent.parent.parent.parent / 'opencv_enhanced_detector.py'
@@ -52,7 +75,11 @@ class Command(BaseCommand):
             return
         
         if options['status']:
-            self.check_status(pid_file)
+            self.check_status(pid_file, self.metrics_url(options))
+            return
+        
+        if options['reload']:
+            self.reload_detector(pid_file)
             return
         
         if not detector_script.exists():
@@ -67,6 +94,12 @@ class Command(BaseCommand):
         if options['no_video']:
             cmd.append('--no-video')
         
+        for camera_id in options['cameras'] or []:
+            cmd.extend(['--camera', camera_id])
+        
+        if options['metrics_port']:
+            cmd.extend(['--metrics-port', str(options['metrics_port'])])
+        
         if options['daemon']:
             self.run_daemon(cmd, pid_file)
         else:
@@ -144,6 +177,23 @@ class Command(BaseCommand):
                 pid_file.unlink()
             raise CommandError(f"Failed to start detector daemon: {e}")
 
+    def reload_detector(self, pid_file):
+        """Send SIGHUP to the detector daemon"""
+        if not pid_file.exists():
+            raise CommandError("No detector daemon is running")
+        
+        with open(pid_file, 'r') as f:
+            pid = int(f.read().strip())
+        
+        try:
+            os.kill(pid, signal.SIGHUP)
+        except OSError as e:
+            raise CommandError(f"Failed to signal detector (PID {pid}): {e}")
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Asked detector daemon (PID {pid}) to reload its configuration')
+        )
+
     def stop_detector(self, pid_file):
         """Stop the detector daemon"""
         if not pid_file.exists():
@@ -192,12 +242,85 @@ class Command(BaseCommand):
         except Exception as e:
             raise CommandError(f"Failed to stop detector: {e}")
 
-    def check_status(self, pid_file):
-        """Check detector daemon status"""
-        if not pid_file.exists():
+    def metrics_url(self, options):
+        """URL of the detector's JSON metrics, from --metrics-port or the config"""
+        port = options['metrics_port']
+        metrics = {}
+        if not port:
+            try:
+                with open(options['config'], 'r') as f:
+                    metrics = (yaml.safe_load(f) or {}).get('metrics', {})
+            except (OSError, yaml.YAMLError):
+                pass
+            port = metrics.get('port', DEFAULT_PORT)
+        host = metrics.get('host', '127.0.0.1')
+        return f"http://{host}:{port}/metrics.json"
+
+    def fetch_metrics(self, url):
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except (OSError, ValueError):
+            return None
+
+    def show_metrics(self, collected):
+        """Print the detector's own metrics per camera"""
+        def ms(histogram, key):
+            value = histogram.get(key)
+            return '-' if value is None else f"{value:g} ms"
+
+        for camera_id, snap in sorted(collected.get('cameras', {}).items()):
+            age = snap.get('last_frame_age_seconds')
+            self.stdout.write(self.style.SUCCESS(f"Camera {camera_id}:"))
             self.stdout.write(
-                self.style.WARNING('No detector daemon is running')
+                f"  {snap['fps']:.1f} FPS, {snap['frames']} frames processed, "
+                f"last frame {'-' if age is None else f'{age:.1f}s'} ago"
             )
+            capture = snap.get('capture') or {}
+            if capture:
+                self.stdout.write(
+                    f"  Capture: {capture['frames_captured']} captured, {capture['frames_dropped']} dropped, "
+                    f"{capture['frames_skipped']} skipped, queue {capture['queue_depth']}/{capture['queue_size']}"
+                )
+            for stage, histogram in snap['stages'].items():
+                if histogram['count']:
+                    self.stdout.write(
+                        f"  {stage:>10}: mean {ms(histogram, 'mean_ms')}, p95 {ms(histogram, 'p95_ms')}"
+                    )
+
+        worker_status = collected.get('workers', {})
+        for camera_id, worker in sorted(worker_status.items()):
+            state = 'alive' if worker['alive'] else 'down'
+            self.stdout.write(f"Worker {camera_id}: {state} (PID {worker['pid']}, {worker['restarts']} restarts)")
+
+        publishing = [collected['publishing']] if collected.get('publishing') else list(collected.get('cameras', {}).values())
+        for snap in publishing:
+            api = snap['api']
+            self.stdout.write(
+                f"API: {api['requests']} requests, {api['errors']} errors, "
+                f"p95 latency {ms(api['latency'], 'p95_ms')}"
+            )
+            if snap.get('publisher'):
+                publisher = snap['publisher']
+                self.stdout.write(
+                    f"Publisher: queue {publisher['queue_length']}, sent {publisher['sent']}, "
+                    f"failed {publisher['failed']}, breaker {publisher['breaker']}"
+                )
+            if snap.get('outbox'):
+                self.stdout.write(f"Outbox: {snap['outbox']['pending']} pending, {snap['outbox']['sent']} sent")
+
+    def check_status(self, pid_file, metrics_url):
+        """Check detector daemon status"""
+        collected = self.fetch_metrics(metrics_url)
+        if collected is not None:
+            self.stdout.write(f"Metrics from {metrics_url}")
+            self.show_metrics(collected)
+        
+        if not pid_file.exists():
+            if collected is None:
+                self.stdout.write(
+                    self.style.WARNING('No detector daemon is running')
+                )
             return
         
         try:
@@ -211,6 +334,9 @@ class Command(BaseCommand):
                     self.style.SUCCESS(f'Detector daemon is running with PID {pid}')
                 )
                 
+                if collected is None:
+                    self.stdout.write(f"No metrics at {metrics_url} (start the detector with --metrics-port)")
+                
                 # Try to get process info
                 try:
                     import psutil
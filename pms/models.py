@@ -1,9 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from . import realtime
+from .slot_cache import slot_states
+
 class SystemSettings(models.Model):
     """Singleton model to store system-wide settings"""
     price_per_minute = models.DecimalField(
@@ -37,6 +41,86 @@ class SystemSettings(models.Model):
     def __str__(self):
         return f"System Settings - Rs. {self.price_per_minute}/min"
 
+
+class StateVersion(models.Model):
+    """Monotonic change counter per tracked state, e.g. LOT_STATE"""
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    @classmethod
+    def current(cls, name):
+        """Current version of a state; 0 before its first change"""
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, name):
+        """Atomically increment a state's version and return the new value"""
+        with transaction.atomic():
+            if not cls.objects.filter(name=name).update(version=F('version') + 1):
+                obj, created = cls.objects.get_or_create(name=name, defaults={'version': 1})
+                if not created:
+                    cls.objects.filter(name=name).update(version=F('version') + 1)
+            # The row stays locked until commit, so this reads our own increment
+            return cls.objects.filter(name=name).values_list('version', flat=True).get()
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class SlotChange(models.Model):
+    """Append-only log of which slots changed at each lot version.
+
+    A null slot means the change could touch any slot, so clients must
+    reload everything. Only the last LOG_SIZE versions are kept.
+    """
+    LOG_SIZE = 1000
+    PRUNE_EVERY = 100
+
+    version = models.BigIntegerField(db_index=True)
+    slot_pk = models.IntegerField(null=True, blank=True, help_text="ParkingSlot id; null for all slots")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"v{self.version}: {self.slot_pk or 'all slots'}"
+
+
+# Slots, sessions, bookings and vehicles: everything the slot status snapshot shows
+LOT_STATE = 'lot'
+# Approval status and roles, for the user management counters
+USER_PROFILES_STATE = 'user_profiles'
+
+
+def state_changed(name):
+    """Bump a state's version once the current transaction commits"""
+    transaction.on_commit(lambda: StateVersion.bump(name))
+
+
+def record_lot_change(slot_ids=None):
+    """Bump the lot version and log the changed slots in one transaction"""
+    with transaction.atomic():
+        version = StateVersion.bump(LOT_STATE)
+        pks = sorted(set(slot_ids)) if slot_ids is not None else [None]
+        SlotChange.objects.bulk_create([SlotChange(version=version, slot_pk=pk) for pk in pks])
+        if version % SlotChange.PRUNE_EVERY == 0:
+            SlotChange.objects.filter(version__lte=version - SlotChange.LOG_SIZE).delete()
+    realtime.publish_slot_changes(version, slot_ids)
+    return version
+
+
+def lot_changed(slot_ids=None):
+    """Bump the lot version once the current transaction commits.
+
+    ``slot_ids`` are the ParkingSlot ids the write touched; None means any
+    slot. Bumping after the commit means a snapshot built for the new
+    version always sees the write. Saves and deletes call this through
+    signals; call it directly after queryset.update() or bulk_update().
+    """
+    slot_ids = None if slot_ids is None else [pk for pk in slot_ids if pk is not None]
+    if slot_ids == []:
+        return
+    transaction.on_commit(lambda: record_lot_change(slot_ids))
+
+
 class ParkingSlot(models.Model):
     slot_id = models.CharField(max_length=20)
     is_occupied = models.BooleanField(default=False)
@@ -282,6 +366,17 @@ def save_user_profile(sender, instance, **kwargs):
         instance.userprofile.save()
 
 
+@receiver([post_save, post_delete], sender=UserProfile)
+def user_profile_changed(sender, **kwargs):
+    state_changed(USER_PROFILES_STATE)
+
+
+@receiver([post_save, post_delete], sender=ParkingSlot)
+def invalidate_slot_states(sender, **kwargs):
+    # Reloading before the write commits would cache the old state
+    transaction.on_commit(slot_states.invalidate)
+
+
 class PasswordResetRequest(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     token = models.CharField(max_length=100, unique=True)
@@ -454,3 +549,33 @@ class Booking(models.Model):
             self.slot.save()
 
         return session
+
+
+@receiver([post_save, post_delete], sender=ParkingSlot)
+def slot_changed(sender, instance, **kwargs):
+    lot_changed([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=ParkingSession)
+@receiver([post_save, post_delete], sender=Booking)
+def slot_activity_changed(sender, instance, **kwargs):
+    lot_changed([instance.slot_id])
+
+
+@receiver(post_save, sender=ParkingSession)
+def push_session(sender, instance, **kwargs):
+    transaction.on_commit(lambda: realtime.publish_session(instance))
+
+
+@receiver(post_save, sender=Booking)
+def push_booking(sender, instance, **kwargs):
+    transaction.on_commit(lambda: realtime.publish_booking(instance))
+
+
+@receiver([post_save, post_delete], sender=Vehicle)
+def vehicle_changed(sender, instance, **kwargs):
+    # Vehicle details show on the slots where the plate is parked
+    lot_changed(ParkingSession.objects.filter(
+        vehicle_number=instance.plate_number,
+        status__in=['pending', 'active']
+    ).values_list('slot_id', flat=True))
@@ -0,0 +1,160 @@
+"""
+Push slot, session and booking changes to dashboard WebSockets.
+
+Publishing happens after the write commits (from the same hooks that bump
+the lot version), through the Channels layer:
+
+    lot            every slot change, as slot status entries
+    zone_<Z>       the entries of zone Z only (the slot id's letter prefix)
+    staff          session and booking events, for staff and managers
+    user_<id>      a customer's own booking events
+
+Slot entries are built once per change, with build_slot_status, and sent
+to every subscriber. A change that may touch any slot goes out as a
+``resync`` event instead; clients then reload /api/slot-status/.
+
+Building the entries and sending them run on one background thread, in
+the order the changes were queued, so neither the queries nor a slow or
+unreachable channel layer hold up the request or detector update that
+made the change. The in-memory development layer is the exception: it is
+sent to inline, and slot entries are only built for it while some
+dashboard is subscribed. Pushed slots count as seen for the
+capture-to-visible latency (latency.tracker.served).
+"""
+
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.db import close_old_connections
+
+from . import latency
+
+logger = logging.getLogger(__name__)
+
+LOT_GROUP = 'lot'
+STAFF_GROUP = 'staff'
+
+# One worker, so events reach each group in the order they happened
+_sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix='realtime')
+
+
+def zone_of(slot_id):
+    """Zone of a slot id: its leading letters ('A' for 'A7'), or 'default'"""
+    match = re.match(r'[A-Za-z]+', str(slot_id))
+    return match.group(0).upper() if match else 'default'
+
+
+def zone_group(zone):
+    # Group names may only hold ASCII letters, digits, hyphens, underscores and periods
+    return 'zone_' + re.sub(r'[^A-Za-z0-9_.-]', '', str(zone).upper())[:80]
+
+
+def user_group(user_id):
+    return f"user_{user_id}"
+
+
+def _send(layer, group, payload):
+    try:
+        async_to_sync(layer.group_send)(group, {'type': 'lot.event', 'payload': payload})
+    except Exception as e:
+        logger.error(f"Publishing {payload.get('type')} to {group} failed: {e}")
+
+
+def _in_background(func, *args):
+    try:
+        func(*args)
+    finally:
+        # The sender thread lives on, so give its connection back like a request would
+        close_old_connections()
+
+
+def _dispatch(layer, func, *args):
+    if isinstance(layer, InMemoryChannelLayer):
+        # No I/O to wait for, and its queues only wake consumers from the caller's event loop
+        func(*args)
+    else:
+        _sender.submit(_in_background, func, *args)
+
+
+def _slot_subscribers(layer):
+    """False when nobody can receive slot events; only the in-memory layer can tell"""
+    if isinstance(layer, InMemoryChannelLayer):
+        return any(channels and (group == LOT_GROUP or group.startswith('zone_'))
+                   for group, channels in list(layer.groups.items()))
+    return True
+
+
+def publish(group, payload):
+    """Queue one event for a group; returns without waiting for the layer"""
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    _dispatch(layer, _send, layer, group, payload)
+
+
+def publish_slot_changes(version, slot_ids):
+    """Queue the changed slots' status entries for the lot and their zones"""
+    layer = get_channel_layer()
+    if layer is None or not _slot_subscribers(layer):
+        return
+    _dispatch(layer, _send_slot_changes, layer, version, slot_ids)
+
+
+def _send_slot_changes(layer, version, slot_ids):
+    from .models import ParkingSlot
+    from .slot_status import build_slot_status
+
+    def resync_zones():
+        # Zone subscribers cannot tell which zone a deleted slot was in
+        zones = {zone_of(slot_id) for slot_id in ParkingSlot.objects.values_list('slot_id', flat=True)}
+        for zone in zones:
+            _send(layer, zone_group(zone), {'type': 'resync', 'version': version})
+
+    if slot_ids is None:
+        _send(layer, LOT_GROUP, {'type': 'resync', 'version': version})
+        resync_zones()
+        return
+
+    try:
+        slots = build_slot_status(slot_ids=slot_ids)
+    except Exception as e:
+        logger.error(f"Building slot entries for v{version} failed: {e}")
+        return
+    present = {slot['id'] for slot in slots}
+    removed = sorted(set(slot_ids) - present)
+    _send(layer, LOT_GROUP, {'type': 'slots', 'version': version, 'slots': slots, 'removed': removed})
+    latency.tracker.served([slot['slot_id'] for slot in slots])
+    if removed:
+        resync_zones()
+        return
+
+    by_zone = {}
+    for slot in slots:
+        by_zone.setdefault(zone_of(slot['slot_id']), []).append(slot)
+    for zone, zone_slots in by_zone.items():
+        _send(layer, zone_group(zone), {'type': 'slots', 'version': version, 'slots': zone_slots, 'removed': []})
+
+
+def publish_session(session):
+    publish(STAFF_GROUP, {
+        'type': 'session',
+        'session_id': session.session_id,
+        'status': session.status,
+        'slot': session.slot_id,
+        'vehicle_number': session.vehicle_number,
+    })
+
+
+def publish_booking(booking):
+    event = {
+        'type': 'booking',
+        'booking_id': booking.booking_id,
+        'status': booking.status,
+        'slot': booking.slot_id,
+        'scheduled_arrival': booking.scheduled_arrival.isoformat() if booking.scheduled_arrival else None,
+    }
+    publish(STAFF_GROUP, event)
+    publish(user_group(booking.customer_id), event)
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/lot/', consumers.LotConsumer.as_asgi()),
+    path('ws/lot/<str:zone>/', consumers.LotConsumer.as_asgi()),
+]
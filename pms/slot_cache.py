@@ -0,0 +1,71 @@
+"""
+Process-local cache of slot states for the video overlay.
+
+Drawing a frame needs every slot's occupied/reserved flags, and the video
+feed draws many frames a second. The overlay reads them from this cache
+instead of the database. Slot writers bump a version counter (ParkingSlot
+post_save/post_delete signals, plus explicit invalidate() calls after
+bulk updates that skip signals); the cache reloads every slot in one query
+when the version has moved, but at most once per refresh interval. Writers
+in other processes cannot signal this one, so the cache is also reloaded
+once it is older than MAX_AGE.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+
+MAX_AGE = 5.0  # seconds
+
+
+class SlotStateCache:
+    """Snapshot of {slot_id: (is_occupied, is_reserved)} refreshed in bulk"""
+
+    def __init__(self, refresh_interval=None, max_age=MAX_AGE):
+        if refresh_interval is None:
+            refresh_interval = getattr(settings, 'SLOT_CACHE_REFRESH_MS', 500) / 1000.0
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self.version = 0
+        self._loaded_version = -1
+        self._loaded_at = float('-inf')
+        self._states = {}
+
+    def invalidate(self):
+        """Mark the snapshot out of date after a slot write"""
+        with self._lock:
+            self.version += 1
+
+    def get(self):
+        """Current snapshot; reloads from the database only when stale and due"""
+        now = time.monotonic()
+        with self._lock:
+            age = now - self._loaded_at
+            stale = self._loaded_version != self.version or age > self.max_age
+            due = age >= self.refresh_interval
+        if stale and due:
+            self.refresh()
+        return self._states
+
+    def refresh(self):
+        from .models import ParkingSlot
+
+        with self._lock:
+            version = self.version
+
+        # slot_id is not unique; like the detector APIs, the oldest row wins
+        states = {}
+        rows = ParkingSlot.objects.order_by('id').values_list('slot_id', 'is_occupied', 'is_reserved')
+        for slot_id, is_occupied, is_reserved in rows:
+            states.setdefault(slot_id, (is_occupied, is_reserved))
+
+        with self._lock:
+            self._states = states
+            self._loaded_version = version
+            self._loaded_at = time.monotonic()
+
+
+slot_states = SlotStateCache()
@@ -0,0 +1,200 @@
+"""
+Snapshot of every slot's status for /api/slot-status/.
+
+The dashboard polls this endpoint for all slots at once. Building each
+slot's entry with its own session, booking and vehicle lookups cost several
+queries per slot; build_slot_status() instead fetches slots, live sessions,
+upcoming and active bookings and the sessions' vehicles in five set-based
+queries and joins them in memory by id, so the cost does not grow with the
+number of slots.
+
+The serialized snapshot is also cached in the Django cache, keyed by the
+lot state version (bumped on every slot, session, booking and vehicle
+write, see models.lot_changed) and the current minute, since the booking
+window and minutes_until_arrival move with the clock. Pollers between two
+writes share one build.
+
+slot_status_changes() serves clients that already hold a snapshot: given
+the version they have, it returns only the slots logged in SlotChange
+since then, or the full snapshot when the log no longer reaches back that
+far. Slots with a booking near its arrival time are always included,
+because their countdown changes without any write.
+"""
+
+import json
+import threading
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import LOT_STATE, Booking, ParkingSession, ParkingSlot, SlotChange, StateVersion, Vehicle
+
+UPCOMING_WINDOW = timedelta(minutes=30)  # Show bookings arriving within 30 minutes
+CACHE_TIMEOUT = 120  # seconds; a key is only used for one minute anyway
+
+# Requests in this process that miss the cache together wait for one build
+_build_lock = threading.Lock()
+
+
+def _user_info(owner):
+    user_profile = getattr(owner, 'userprofile', None)
+    return {
+        'name': owner.get_full_name() or owner.username,
+        'email': owner.email,
+        'phone': user_profile.phone_number if user_profile else None,
+        'user_type': user_profile.get_user_type_display() if user_profile else 'Unknown'
+    }
+
+
+def build_slot_status(now=None, slot_ids=None):
+    """List of slot status dicts, ordered by slot_id; all slots unless ``slot_ids`` (ParkingSlot ids) is given"""
+    now = now or timezone.now()
+
+    slots = ParkingSlot.objects.all()
+    live_sessions = ParkingSession.objects.filter(status__in=['pending', 'active'])
+    upcoming_bookings = Booking.objects.filter(slot__isnull=False)
+    if slot_ids is not None:
+        slots = slots.filter(pk__in=slot_ids)
+        live_sessions = live_sessions.filter(slot_id__in=slot_ids)
+        upcoming_bookings = upcoming_bookings.filter(slot_id__in=slot_ids)
+
+    slots = list(slots.order_by('slot_id'))
+
+    # Latest pending/active session per slot (what .last() picked per slot)
+    sessions = {}
+    for session in live_sessions.order_by('id'):
+        sessions[session.slot_id] = session
+
+    # Earliest confirmed booking per slot arriving within the window
+    upcoming = {}
+    upcoming_bookings = upcoming_bookings.filter(
+        status='confirmed',
+        scheduled_arrival__gte=now,
+        scheduled_arrival__lte=now + UPCOMING_WINDOW
+    ).select_related('vehicle', 'customer').order_by('scheduled_arrival')
+    for booking in upcoming_bookings:
+        upcoming.setdefault(booking.slot_id, booking)
+
+    # Active bookings tied to the live sessions, for the expected duration
+    related = {}
+    if sessions:
+        related_bookings = Booking.objects.filter(
+            status='active',
+            parking_session_id__in=[session.id for session in sessions.values()]
+        ).only('slot_id', 'parking_session_id', 'expected_duration')
+        for booking in related_bookings:
+            related[booking.parking_session_id] = booking
+
+    # Registered vehicles (and owners) of the parked plates
+    vehicles = {}
+    plates = {session.vehicle_number for session in sessions.values() if session.vehicle_number}
+    if plates:
+        active_vehicles = Vehicle.objects.filter(
+            plate_number__in=plates,
+            is_active=True
+        ).select_related('owner', 'owner__userprofile')
+        for vehicle in active_vehicles:
+            vehicles[vehicle.plate_number] = vehicle
+
+    data = []
+    for slot in slots:
+        session = sessions.get(slot.id)
+        session_status = session.status if session else None
+        vehicle_number = session.vehicle_number if session else None
+        session_start = session.start_time if session else None
+        upcoming_booking = upcoming.get(slot.id)
+
+        # Calculate when occupied slot will be free
+        estimated_free_time = None
+        if slot.is_occupied and session and session.start_time:
+            related_booking = related.get(session.id)
+            if related_booking and related_booking.slot_id == slot.id and related_booking.expected_duration:
+                estimated_free_time = (session.start_time + timedelta(minutes=related_booking.expected_duration)).isoformat()
+
+        vehicle_info = vehicles.get(vehicle_number) if vehicle_number else None
+        user_info = _user_info(vehicle_info.owner) if vehicle_info and vehicle_info.owner else None
+
+        data.append({
+            'id': slot.id,
+            'slot_id': slot.slot_id,
+            'is_occupied': slot.is_occupied,
+            'is_reserved': slot.is_reserved,
+            'session_status': session_status,
+            'vehicle_number': vehicle_number,
+            'session_start': session_start.isoformat() if session_start else None,
+            'timestamp': slot.timestamp.isoformat(),
+            'estimated_free_time': estimated_free_time,
+            'upcoming_booking': {
+                'booking_id': upcoming_booking.booking_id,
+                'scheduled_arrival': upcoming_booking.scheduled_arrival.isoformat(),
+                'vehicle': upcoming_booking.vehicle.plate_number if upcoming_booking.vehicle else None,
+                'customer': upcoming_booking.customer.get_full_name() or upcoming_booking.customer.username,
+                'minutes_until_arrival': int((upcoming_booking.scheduled_arrival - now).total_seconds() / 60)
+            } if upcoming_booking else None,
+            'user_info': user_info,
+            'vehicle_info': {
+                'make': vehicle_info.make,
+                'model': vehicle_info.model,
+                'year': vehicle_info.year,
+                'color': vehicle_info.color,
+                'type': vehicle_info.get_vehicle_type_display()
+            } if vehicle_info else None
+        })
+
+    return data
+
+
+def cached_slot_status(now=None):
+    """(lot version, JSON-encoded snapshot), built at most once per version and minute"""
+    version = StateVersion.current(LOT_STATE)
+    now = now or timezone.now()
+    key = f"slot_status:{version}:{int(now.timestamp() // 60)}"
+
+    body = cache.get(key)
+    if body is None:
+        with _build_lock:
+            body = cache.get(key)
+            if body is None:
+                body = json.dumps(build_slot_status(now), cls=DjangoJSONEncoder)
+                cache.set(key, body, CACHE_TIMEOUT)
+    return version, body
+
+
+def slot_status_changes(since, now=None):
+    """Slots changed after lot version ``since``.
+
+    Returns {'version', 'full', 'slots', 'removed'}: with ``full`` set,
+    ``slots`` is the whole snapshot and replaces what the client holds;
+    otherwise it holds just the changed slots, and ``removed`` the ids of
+    deleted ones.
+    """
+    now = now or timezone.now()
+    version = StateVersion.current(LOT_STATE)
+
+    changed = None
+    if since is not None and version - SlotChange.LOG_SIZE <= since <= version:
+        changed = set(SlotChange.objects.filter(version__gt=since).values_list('slot_pk', flat=True))
+        if None in changed:
+            changed = None
+
+    if changed is None:
+        version, body = cached_slot_status(now)
+        return {'version': version, 'full': True, 'slots': json.loads(body), 'removed': []}
+
+    changed.update(Booking.objects.filter(
+        slot__isnull=False,
+        status='confirmed',
+        scheduled_arrival__gte=now - UPCOMING_WINDOW,
+        scheduled_arrival__lte=now + UPCOMING_WINDOW
+    ).values_list('slot_id', flat=True))
+
+    slots = build_slot_status(now, changed) if changed else []
+    present = {slot['id'] for slot in slots}
+    return {
+        'version': version,
+        'full': False,
+        'slots': slots,
+        'removed': sorted(changed - present),
+    }
@@ -1,3 +1,356 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from channels.routing import URLRouter
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import latency, realtime
+from .models import LOT_STATE, Booking, ParkingSession, ParkingSlot, SlotChange, StateVersion, Vehicle
+from .routing import websocket_urlpatterns
+from .slot_status import build_slot_status, cached_slot_status, slot_status_changes
+
+
+class SlotStatusSnapshotTests(TestCase):
+    """The slot status snapshot costs the same number of queries for any lot size"""
+
+    def add_slots(self, count):
+        now = timezone.now()
+        for index in range(count):
+            number = ParkingSlot.objects.count() + 1
+            slot = ParkingSlot.objects.create(slot_id=f"T{number}", is_occupied=True)
+            owner = User.objects.create_user(username=f"driver{number}", first_name='Test', last_name=f"Driver {number}")
+            vehicle = Vehicle.objects.create(owner=owner, plate_number=f"TEST-{number}", make='Toyota')
+            session = ParkingSession.objects.create(
+                vehicle_number=vehicle.plate_number, slot=slot, status='active', start_time=now - timedelta(minutes=10)
+            )
+            Booking.objects.create(
+                customer=owner, vehicle=vehicle, slot=slot, status='active', parking_session=session,
+                scheduled_arrival=now - timedelta(minutes=15), expected_duration=60
+            )
+            Booking.objects.create(
+                customer=owner, vehicle=vehicle, slot=slot, status='confirmed',
+                scheduled_arrival=now + timedelta(minutes=20), expected_duration=30
+            )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = build_slot_status()
+        return len(queries), data
+
+    def test_query_count_does_not_grow_with_slots(self):
+        self.add_slots(2)
+        small_count, small = self.count_queries()
+        self.add_slots(20)
+        large_count, large = self.count_queries()
+
+        self.assertEqual(len(small), 2)
+        self.assertEqual(len(large), 22)
+        self.assertEqual(small_count, large_count)
+        self.assertLessEqual(large_count, 5)
+
+    def test_snapshot_joins_sessions_bookings_and_vehicles(self):
+        self.add_slots(1)
+        with self.assertNumQueries(5):
+            [entry] = build_slot_status()
+
+        self.assertEqual(entry['session_status'], 'active')
+        self.assertEqual(entry['vehicle_number'], 'TEST-1')
+        self.assertIsNotNone(entry['estimated_free_time'])
+        self.assertEqual(entry['upcoming_booking']['vehicle'], 'TEST-1')
+        self.assertEqual(entry['user_info']['name'], 'Test Driver 1')
+        self.assertEqual(entry['user_info']['user_type'], 'Customer')
+        self.assertEqual(entry['vehicle_info']['make'], 'Toyota')
+
+    def test_api_requires_login(self):
+        response = self.client.get(reverse('slot_status_api'))
+        self.assertEqual(response.status_code, 401)
+
+
+class SlotStatusCacheTests(TestCase):
+    """Pollers share one snapshot build until the lot state changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.slot = ParkingSlot.objects.create(slot_id='C1')
+
+    def test_snapshot_is_built_once_per_version(self):
+        now = timezone.now()
+        version, body = cached_slot_status(now)
+        with self.assertNumQueries(1):
+            self.assertEqual(cached_slot_status(now), (version, body))
+
+    def test_writes_bump_the_version(self):
+        version, _ = cached_slot_status()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot.is_occupied = True
+            self.slot.save()
+
+        new_version, body = cached_slot_status()
+        self.assertGreater(new_version, version)
+        self.assertTrue(json.loads(body)[0]['is_occupied'])
+
+
+class SlotStatusChangesTests(TestCase):
+    """Delta sync returns only the slots changed since the client's version"""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots = [ParkingSlot.objects.create(slot_id=f"D{index}") for index in range(5)]
+
+    def test_unknown_version_gets_full_snapshot(self):
+        changes = slot_status_changes(None)
+        self.assertTrue(changes['full'])
+        self.assertEqual(len(changes['slots']), 5)
+
+    def test_only_changed_slots_are_returned(self):
+        version = slot_status_changes(None)['version']
+        removed = self.slots[4].pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slots[2].is_occupied = True
+            self.slots[2].save()
+            self.slots[4].delete()
+
+        changes = slot_status_changes(version)
+        self.assertFalse(changes['full'])
+        self.assertEqual([slot['slot_id'] for slot in changes['slots']], ['D2'])
+        self.assertEqual(changes['removed'], [removed])
+        self.assertEqual(slot_status_changes(changes['version'])['slots'], [])
+
+    def test_client_behind_the_log_gets_full_snapshot(self):
+        version = slot_status_changes(None)['version']
+        changes = slot_status_changes(version - SlotChange.LOG_SIZE - 1)
+        self.assertTrue(changes['full'])
+
+
+class ConditionalPollingTests(TestCase):
+    """Unchanged polls get a 304 without running the view"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='manager', password='secret')
+        self.user.userprofile.user_type = 'manager'
+        self.user.userprofile.approval_status = 'approved'
+        self.user.userprofile.save()
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot = ParkingSlot.objects.create(slot_id='E1')
+
+    def assert_revalidates(self, name):
+        response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+
+        response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        return response
+
+    def test_slot_status_revalidates_until_a_slot_changes(self):
+        etag = self.assert_revalidates('slot_status_api')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot.is_occupied = True
+            self.slot.save()
+
+        response = self.client.get(reverse('slot_status_api'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_counters_revalidate(self):
+        for name in ('live_stats_api', 'dashboard_analytics_api', 'pending_approvals_count_api', 'staff_stats_api'):
+            with self.subTest(name):
+                self.assert_revalidates(name)
+
+    def test_pending_approvals_change_with_new_profiles(self):
+        response = self.client.get(reverse('pending_approvals_count_api'))
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(username='newcomer')
+
+        response = self.client.get(reverse('pending_approvals_count_api'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+
+class DetectorHeartbeatTests(TestCase):
+    """Repeating a slot's current state refreshes its timestamp without a lot change"""
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.slot = ParkingSlot.objects.create(slot_id='H1', is_occupied=True)
+        self.version = StateVersion.current(LOT_STATE)
+        self.stale = timezone.now() - timedelta(minutes=5)
+        ParkingSlot.objects.filter(pk=self.slot.pk).update(timestamp=self.stale)
+
+    def post(self, name, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse(name), data, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def assert_heartbeat(self):
+        self.slot.refresh_from_db()
+        self.assertGreater(self.slot.timestamp, self.stale)
+        self.assertEqual(StateVersion.current(LOT_STATE), self.version)
+        self.assertFalse(SlotChange.objects.filter(version__gt=self.version).exists())
+
+    def test_update_slot_heartbeat(self):
+        self.post('api_update_slot', {'slot_id': 'H1', 'is_occupied': True})
+        self.assert_heartbeat()
+
+    def test_batch_heartbeat(self):
+        self.post('api_update_slots_batch', {'updates': [{'slot_id': 'H1', 'is_occupied': True}]})
+        self.assert_heartbeat()
+
+    def test_state_change_bumps_the_version(self):
+        self.post('api_update_slots_batch', {'updates': [{'slot_id': 'H1', 'is_occupied': False}]})
+        self.assertGreater(StateVersion.current(LOT_STATE), self.version)
+
+
+class BatchSlotUpdateTests(TestCase):
+    """/api/update-slots/ applies detector batches with update_slot's rules"""
+
+    def post(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('api_update_slots_batch'), data, content_type='application/json')
+
+    def test_last_record_for_a_slot_wins(self):
+        response = self.post({'updates': [
+            {'slot_id': 'B1', 'is_occupied': True},
+            {'slot_id': 'B2', 'is_occupied': 'true'},
+            {'slot_id': 'B1', 'is_occupied': False},
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['processed'], 3)
+        states = dict(ParkingSlot.objects.values_list('slot_id', 'is_occupied'))
+        self.assertEqual(states, {'B1': False, 'B2': True})
+
+    def test_vacancy_of_a_reserved_slot_is_ignored(self):
+        ParkingSlot.objects.create(slot_id='B1', is_reserved=True)
+        response = self.post([{'slot_id': 'B1', 'is_occupied': False}])
+
+        [result] = response.json()['results']
+        self.assertEqual(result['status'], 'ignored')
+        self.assertTrue(ParkingSlot.objects.get(slot_id='B1').is_reserved)
+
+    def test_occupied_reserved_slot_activates_its_session(self):
+        slot = ParkingSlot.objects.create(slot_id='B1', is_reserved=True)
+        owner = User.objects.create_user(username='driver')
+        vehicle = Vehicle.objects.create(owner=owner, plate_number='BATCH-1')
+        session = ParkingSession.objects.create(vehicle_number='BATCH-1', slot=slot, status='pending')
+        booking = Booking.objects.create(
+            customer=owner, vehicle=vehicle, slot=slot, status='active', parking_session=session,
+            scheduled_arrival=timezone.now(), expected_duration=60
+        )
+
+        response = self.post([{'slot_id': 'B1', 'is_occupied': True}])
+
+        self.assertEqual(response.json()['auto_activated'], 1)
+        slot.refresh_from_db()
+        session.refresh_from_db()
+        booking.refresh_from_db()
+        self.assertTrue(slot.is_occupied)
+        self.assertFalse(slot.is_reserved)
+        self.assertEqual(session.status, 'active')
+        self.assertIsNotNone(session.start_time)
+        self.assertTrue(booking.camera_detected)
+
+    def test_invalid_batches_are_rejected(self):
+        from .views import MAX_BATCH_UPDATES
+
+        too_many = [{'slot_id': f"B{index}", 'is_occupied': True} for index in range(MAX_BATCH_UPDATES + 1)]
+        for data in ([], {'updates': []}, {'updates': 'B1'}, {'updates': too_many},
+                     [{'slot_id': 'B1'}]):
+            with self.subTest(data=str(data)[:40]):
+                self.assertEqual(self.post(data).status_code, 400)
+        self.assertFalse(ParkingSlot.objects.exists())
+
+    def test_bad_captured_at_still_applies_the_update(self):
+        response = self.post([{'slot_id': 'B1', 'is_occupied': True, 'captured_at': 'yesterday',
+                               'timestamp': 'not a date'}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(ParkingSlot.objects.get(slot_id='B1').is_occupied)
+
+
+class RealtimePublishTests(TestCase):
+    """A slow channel layer does not hold up the write that triggered the push"""
+
+    def test_publish_does_not_wait_for_the_layer(self):
+        release = threading.Event()
+        sent = threading.Event()
+
+        class SlowLayer:
+            async def group_send(self, group, message):
+                await sync_to_async(release.wait)(5)
+                sent.set()
+
+        with mock.patch.object(realtime, 'get_channel_layer', return_value=SlowLayer()):
+            started = time.monotonic()
+            realtime.publish(realtime.LOT_GROUP, {'type': 'resync', 'version': 1})
+            self.assertLess(time.monotonic() - started, 1)
+
+        release.set()
+        self.assertTrue(sent.wait(5))
+
+    def test_slot_entries_are_not_built_without_subscribers(self):
+        slot = ParkingSlot.objects.create(slot_id='R1')
+        with self.assertNumQueries(0):
+            realtime.publish_slot_changes(1, [slot.pk])
+
+
+class LotConsumerTests(TransactionTestCase):
+    """Slot changes reach subscribed WebSockets after the write commits"""
+
+    async def connect(self, path, user):
+        # channels.testing needs daphne, so talk ASGI to the router directly
+        scope = {'type': 'websocket', 'path': path, 'headers': [], 'subprotocols': [], 'user': user}
+        communicator = ApplicationCommunicator(URLRouter(websocket_urlpatterns), scope)
+        await communicator.send_input({'type': 'websocket.connect'})
+        return communicator, await communicator.receive_output(1)
+
+    async def subscribe(self, path, user):
+        communicator, reply = await self.connect(path, user)
+        self.assertEqual(reply['type'], 'websocket.accept')
+        self.assertEqual((await self.receive(communicator))['type'], 'hello')
+        return communicator
+
+    async def receive(self, communicator):
+        return json.loads((await communicator.receive_output(1))['text'])
+
+    async def test_slot_changes_are_pushed_to_lot_and_zone(self):
+        user = await sync_to_async(User.objects.create_user)(username='viewer')
+        lot = await self.subscribe('/ws/lot/', user)
+        zone_a = await self.subscribe('/ws/lot/a/', user)
+        zone_b = await self.subscribe('/ws/lot/B/', user)
+
+        tracker = latency.LatencyTracker()
+        tracker.committed('A1', 'default', time.time() - 1)
+        with mock.patch.object(latency, 'tracker', tracker):
+            await sync_to_async(ParkingSlot.objects.create)(slot_id='A1', is_occupied=True)
+        # The push made the change visible
+        self.assertEqual(tracker.snapshot()['awaiting_visibility'], 0)
+
+        event = await self.receive(lot)
+        self.assertEqual(event['type'], 'slots')
+        self.assertEqual([slot['slot_id'] for slot in event['slots']], ['A1'])
+        event = await self.receive(zone_a)
+        self.assertTrue(event['slots'][0]['is_occupied'])
+        self.assertTrue(await zone_b.receive_nothing())
+
+        for communicator in (lot, zone_a, zone_b):
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(1)
+
+    async def test_anonymous_users_are_refused(self):
+        communicator, reply = await self.connect('/ws/lot/', AnonymousUser())
+        self.assertEqual(reply['type'], 'websocket.close')
@@ -19,7 +19,9 @@ urlpatterns = [
 
     # API endpoints
     path('api/update-slot/', update_slot, name='api_update_slot'),
+    path('api/update-slots/', views.update_slots_batch, name='api_update_slots_batch'),
     path('api/slot-status/', views.slot_status_api, name='slot_status_api'),
+    path('api/slot-status/changes/', views.slot_status_changes_api, name='slot_status_changes_api'),
     path('api/slot-status-sync/', views.slot_status_sync_api, name='slot_status_sync_api'),
     path('api/check-slot-availability/', views.check_slot_availability, name='check_slot_availability'),
     path('api/dashboard-analytics/', views.dashboard_analytics_api, name='dashboard_analytics_api'),
@@ -28,9 +30,11 @@ urlpatterns = [
     path('api/available-slots/', views.get_available_slots, name='get_available_slots'),
     path('api/security-events/', views.security_events_api, name='security_events_api'),
     path('api/security-action/', views.security_action_api, name='security_action_api'),
+    path('api/latency/', views.latency_api, name='latency_api'),
 
     # Video feed
     path('video-feed/', views.video_feed, name='video_feed'),
+    path('video-feed/latest.jpg', views.video_snapshot, name='video_snapshot'),
 
     # Staff operations
     path('staff/assign/', views.unified_parking_management, name='assign-slot'),
@@ -8,6 +8,7 @@ from django.core.paginator import Paginator
 from django.db.models import Q
 from .models import UserProfile, ParkingSession
 from .permissions import require_manager, require_staff_or_manager
+from .etags import conditional, user_profiles_etag
 from .forms import EnhancedUserCreationForm
 import json
 
@@ -288,6 +289,7 @@ def manager_system_settings(request):
 
 # API endpoints for dashboard updates
 @require_manager
+@conditional(user_profiles_etag)
 def pending_approvals_count_api(request):
     """API endpoint to get pending approvals count"""
     count = UserProfile.objects.filter(approval_status='pending').count()
@@ -295,6 +297,7 @@ def pending_approvals_count_api(request):
 
 
 @require_staff_or_manager
+@conditional(user_profiles_etag)
 def staff_stats_api(request):
     """API endpoint to get staff dashboard stats"""
     data = {
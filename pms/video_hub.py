@@ -0,0 +1,440 @@
+"""
+Shared video feed producers for /video-feed/.
+
+Each camera gets one background producer thread that owns the capture,
+runs detection, syncs the database and encodes the annotated frame. Any
+number of streaming clients read the latest encoded frame from it, each at
+its own pace: a client that falls behind simply skips to the newest frame,
+so a slow viewer never stalls the producer or the other viewers. A producer
+releases its camera once it has had no clients for IDLE_TIMEOUT seconds.
+
+Frames are JPEG-encoded on demand, at most once per frame and quality tier
+(see QUALITY_TIERS), however many clients are watching that tier.
+
+Cameras are configured with VIDEO_FEED_CAMERAS in settings, mapping a
+camera id to a cv2.VideoCapture source, or to "shm:<segment>" to read the
+annotated frames the standalone detector publishes to shared memory
+instead of opening the camera a second time.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+
+import cv2
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from detector.engine import OccupancyEngine
+from detector.scheduler import FrameScheduler
+from detector.shm import FrameRing
+from .models import ParkingSlot
+from .slot_cache import slot_states
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAMERA = 'default'
+SHARED_MEMORY_PREFIX = 'shm:'
+
+PARKING_SLOTS = [
+    (60, 0, 150, 57), (60, 56, 150, 57), (60, 115, 150, 59),
+    (60, 175, 150, 59), (60, 235, 150, 59), (60, 295, 150, 59),
+    (60, 355, 150, 59), (212, 0, 150, 57), (212, 56, 150, 57),
+    (212, 115, 150, 59), (212, 175, 150, 59), (212, 235, 150, 59),
+    (212, 295, 150, 59), (212, 355, 150, 59),
+]
+SLOT_IDS = [f"{'A' if idx < 7 else 'B'}{(idx % 7) + 1}" for idx in range(len(PARKING_SLOTS))]
+
+OCCUPANCY_THRESHOLD = 0.03  # 0.1
+IDLE_TIMEOUT = 30.0  # seconds without clients before the camera is released
+RING_POLL_INTERVAL = 0.01  # seconds between checks for a new shared-memory frame
+MAX_CLIENT_FPS = 30.0
+
+# Encoding presets clients pick with ?quality=; width None keeps the camera resolution
+QUALITY_TIERS = {
+    'thumbnail': {'width': 320, 'jpeg_quality': 60},
+    'standard': {'width': 640, 'jpeg_quality': 75},
+    'full': {'width': None, 'jpeg_quality': 90},
+}
+DEFAULT_TIER = 'standard'
+
+
+def camera_sources():
+    """Configured camera id -> capture source"""
+    # Change to 0 for webcam 1 for droidcam 2 for droidcam2 'parking_lot.mp4' for dummy video
+    return getattr(settings, 'VIDEO_FEED_CAMERAS', {DEFAULT_CAMERA: 0})
+
+
+def shared_memory_name(source):
+    """Segment name for a "shm:<segment>" source, else None"""
+    if isinstance(source, str) and source.startswith(SHARED_MEMORY_PREFIX):
+        return source[len(SHARED_MEMORY_PREFIX):]
+    return None
+
+
+RING_STALE_AFTER = 5.0  # seconds without a new frame before re-attaching (detector may have restarted)
+
+_rings = {}  # segment name -> [ring, last sequence, when it last changed]
+_rings_lock = threading.Lock()
+
+
+def attach_ring(name):
+    """Process-wide read-only attachment to a detector's frame ring, or None if it is not running"""
+    with _rings_lock:
+        now = time.monotonic()
+        cached = _rings.get(name)
+        if cached is not None:
+            ring, sequence, changed_at = cached
+            latest = ring.latest_sequence
+            if latest != sequence:
+                cached[1:] = [latest, now]
+                return ring
+            if now - changed_at < RING_STALE_AFTER:
+                return ring
+            # A restarted detector creates a new segment under the same name
+            del _rings[name]
+            ring.close()
+
+        try:
+            ring = FrameRing.attach(name)
+        except (FileNotFoundError, ValueError):
+            return None
+        _rings[name] = [ring, ring.latest_sequence, now]
+        return ring
+
+
+def detection_states():
+    """Latest detector slot states {slot_id: is_occupied} from every shared-memory camera"""
+    states = {}
+    for source in camera_sources().values():
+        name = shared_memory_name(source)
+        ring = attach_ring(name) if name else None
+        if ring is not None:
+            states.update(ring.read_states() or {})
+    return states
+
+
+class FeedProducer:
+    """Capture, annotate and encode one camera for all of its viewers"""
+
+    def __init__(self, camera_id, source):
+        self.camera_id = camera_id
+        self.source = source
+        self.engine = OccupancyEngine(PARKING_SLOTS)
+        self.last_update = {}  # Track last update time for each slot to avoid too frequent updates
+
+        self._condition = threading.Condition()
+        self._sequence = 0
+        self._frame = None
+        # One lock per tier, so viewers of different tiers encode in parallel
+        self._encode_locks = {tier: threading.Lock() for tier in QUALITY_TIERS}
+        self._encoded = {}  # tier -> (sequence, jpeg bytes)
+        self._clients = 0
+        self._idle_since = time.monotonic()
+        self._thread = None
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name=f"video-feed-{self.camera_id}", daemon=True)
+        self._thread.start()
+
+    def subscribe(self):
+        """Add a client; False if the producer is already shutting down"""
+        with self._condition:
+            if not self.running:
+                return False
+            self._clients += 1
+            return True
+
+    def unsubscribe(self):
+        with self._condition:
+            self._clients -= 1
+            if self._clients <= 0:
+                self._idle_since = time.monotonic()
+
+    @property
+    def clients(self):
+        return self._clients
+
+    def wait_for_frame(self, after_sequence, tier=DEFAULT_TIER, timeout=5.0):
+        """Block until a frame newer than ``after_sequence`` exists; returns (sequence, jpeg) or None"""
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self._sequence > after_sequence or not self.running, timeout
+            ):
+                return None
+            if self._sequence <= after_sequence:
+                return None
+        return self.encoded(tier)
+
+    def encoded(self, tier=DEFAULT_TIER):
+        """The latest frame as (sequence, jpeg) in a quality tier, encoded once and cached"""
+        with self._encode_locks[tier]:
+            with self._condition:
+                sequence, frame = self._sequence, self._frame
+            if frame is None:
+                return None
+
+            cached = self._encoded.get(tier)
+            if cached is not None and cached[0] == sequence:
+                return cached
+
+            tier_settings = QUALITY_TIERS[tier]
+            height, width = frame.shape[:2]
+            if tier_settings['width'] and width > tier_settings['width']:
+                scale = tier_settings['width'] / width
+                frame = cv2.resize(frame, (tier_settings['width'], int(round(height * scale))),
+                                   interpolation=cv2.INTER_AREA)
+
+            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, tier_settings['jpeg_quality']])
+            if not ret:
+                return None
+            cached = (sequence, buffer.tobytes())
+            self._encoded[tier] = cached
+            return cached
+
+    def _publish(self, frame):
+        with self._condition:
+            self._frame = frame
+            self._sequence += 1
+            self._condition.notify_all()
+
+    def _idle(self):
+        """Stop accepting clients once nobody has watched for IDLE_TIMEOUT"""
+        with self._condition:
+            if self._clients <= 0 and time.monotonic() - self._idle_since > IDLE_TIMEOUT:
+                self.running = False
+            return not self.running
+
+    def _run(self):
+        logger.info(f"Video feed producer started for camera {self.camera_id}")
+        try:
+            ring_name = shared_memory_name(self.source)
+            if ring_name:
+                self._run_shared_memory(ring_name)
+            else:
+                self._run_capture()
+        finally:
+            connection.close()
+            with self._condition:
+                self.running = False
+                self._condition.notify_all()
+            logger.info(f"Video feed producer stopped for camera {self.camera_id}")
+
+    def _run_capture(self):
+        """Own the camera: capture, detect, sync the database and annotate"""
+        cap = cv2.VideoCapture(self.source)
+        scheduler = FrameScheduler(source_fps=cap.get(cv2.CAP_PROP_FPS))
+        previous = None
+
+        try:
+            while not self._idle():
+                # Lower the frame rate while nothing changes; skipped frames are grabbed, not decoded
+                scheduler.pace()
+                if not scheduler.take():
+                    if not cap.grab():
+                        break
+                    continue
+
+                success, frame = cap.read()
+                if not success:
+                    break
+
+                occupied = self.engine.occupied(frame, OCCUPANCY_THRESHOLD)
+                activity = previous is None or bool((occupied != previous).any())
+                previous = occupied.copy()
+
+                if self.annotate(frame, occupied):
+                    scheduler.expect_activity(2)  # A pending session is about to arrive
+                scheduler.record(activity)
+
+                # Encoding happens lazily, per requested tier
+                self._publish(frame)
+        finally:
+            cap.release()
+
+    def _run_shared_memory(self, name):
+        """Follow the annotated frames a detector process publishes to shared memory"""
+        sequence = 0
+        while not self._idle():
+            ring = attach_ring(name)
+            if ring is None:
+                # Detector not running (yet)
+                time.sleep(1.0)
+                continue
+
+            entry = ring.read()
+            if entry is None or entry['sequence'] == sequence:
+                time.sleep(RING_POLL_INTERVAL)
+                continue
+
+            # One copy out of the ring, so lazy encoding is safe from the writer
+            frame = entry['frame'].copy()
+            if not ring.valid(entry):
+                continue
+            sequence = entry['sequence']
+            self._publish(frame)
+
+    def annotate(self, frame, occupied):
+        """Sync detections to the database and draw slot states; returns True if a slot is reserved"""
+        current_time = timezone.now()
+        reserved = False
+
+        # Overlay colours come from the in-memory slot cache, not a query per frame
+        try:
+            db_states = slot_states.get()
+        except Exception as e:
+            print(f"[VIDEO FEED] Database error: {e}")
+            db_states = None
+
+        for idx, (x, y, w, h) in enumerate(PARKING_SLOTS):
+            slot_id = SLOT_IDS[idx]
+            is_occupied = bool(occupied[idx])
+
+            try:
+                if db_states is None:
+                    raise RuntimeError("slot states unavailable")
+                state = db_states.get(slot_id)
+                if state is None:
+                    # First sighting of this slot: create it (the save refreshes the cache)
+                    db_slot, created = ParkingSlot.objects.get_or_create(
+                        slot_id=slot_id,
+                        defaults={'is_occupied': is_occupied, 'is_reserved': False}
+                    )
+                    state = (db_slot.is_occupied, db_slot.is_reserved)
+                db_occupied, db_reserved = state
+
+                # Update database if detection differs and enough time has passed
+                time_since_last_update = (current_time - self.last_update.get(slot_id, current_time - timedelta(seconds=10))).total_seconds()
+
+                if db_occupied != is_occupied and time_since_last_update > 1:  # Update every 1 second max
+                    # Don't update reserved slots to vacant (false vacancy signals)
+                    if not (db_reserved and not is_occupied):
+                        self.send_update(slot_id, is_occupied, current_time)
+                    else:
+                        print(f"[VIDEO FEED] Ignoring vacancy signal for reserved slot {slot_id}")
+
+                # Simple three-state color coding: Green=Vacant, Yellow=Reserved, Red=Occupied
+                if db_reserved and not db_occupied:
+                    reserved = True
+                    color = (0, 255, 255)  # Yellow for reserved
+                    label = f"{slot_id}: Reserved"
+                elif db_occupied:
+                    color = (0, 0, 255)  # Red for occupied
+                    label = f"{slot_id}: Occupied"
+                else:
+                    color = (0, 255, 0)  # Green for vacant
+                    label = f"{slot_id}: Vacant"
+
+            except Exception as e:
+                # Fallback to detection if there's any database error
+                color = (0, 0, 255) if is_occupied else (0, 255, 0)
+                label = f"{slot_id}: {'Occupied' if is_occupied else 'Vacant'} (DB ERROR)"
+                print(f"[VIDEO FEED] Database error for {slot_id}: {e}")
+
+            cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
+            cv2.putText(frame, label, (x, y - 5),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+
+        return reserved
+
+    def send_update(self, slot_id, is_occupied, current_time):
+        """Report a changed slot through the API, falling back to a direct save"""
+        # Call the API endpoint instead of directly updating database
+        try:
+            import requests
+            api_url = 'http://127.0.0.1:8000/api/update-slot/'
+            data = {
+                'slot_id': slot_id,
+                'is_occupied': is_occupied,
+                'detector_id': 'video_feed'
+            }
+            response = requests.post(api_url, json=data, timeout=1)
+            if response.status_code == 200:
+                self.last_update[slot_id] = current_time
+                print(f"[VIDEO FEED] API Updated {slot_id}: {'Occupied' if is_occupied else 'Vacant'}")
+            else:
+                print(f"[VIDEO FEED] API Error {slot_id}: {response.status_code}")
+        except Exception as api_error:
+            # Fallback to direct database update if API fails
+            db_slot = ParkingSlot.objects.filter(slot_id=slot_id).order_by('id').first()
+            if db_slot is not None:
+                db_slot.is_occupied = is_occupied
+                db_slot.save()
+            self.last_update[slot_id] = current_time
+            print(f"[VIDEO FEED] Direct DB Updated {slot_id}: {'Occupied' if is_occupied else 'Vacant'} (API failed: {api_error})")
+
+
+class VideoHub:
+    """Registry of running producers, one per camera"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._producers = {}
+
+    def subscribe(self, camera_id):
+        """Return the camera's producer, starting it if needed, with one more client"""
+        sources = camera_sources()
+        if camera_id not in sources:
+            raise KeyError(camera_id)
+
+        with self._lock:
+            producer = self._producers.get(camera_id)
+            if producer is None or not producer.subscribe():
+                producer = FeedProducer(camera_id, sources[camera_id])
+                self._producers[camera_id] = producer
+                producer.start()
+                producer.subscribe()
+            return producer
+
+    def status(self):
+        with self._lock:
+            return {
+                camera_id: {'running': producer.running, 'clients': producer.clients}
+                for camera_id, producer in self._producers.items()
+            }
+
+
+hub = VideoHub()
+
+
+def snapshot(camera_id=DEFAULT_CAMERA, tier=DEFAULT_TIER, timeout=5.0):
+    """Latest cached JPEG for a camera, waiting for the first frame if the producer just started"""
+    producer = hub.subscribe(camera_id)
+    try:
+        latest = producer.encoded(tier) or producer.wait_for_frame(0, tier, timeout)
+        return latest[1] if latest else None
+    finally:
+        producer.unsubscribe()
+
+
+def stream(camera_id=DEFAULT_CAMERA, fps=None, tier=DEFAULT_TIER):
+    """MJPEG multipart generator for one client, paced to at most ``fps``"""
+    producer = hub.subscribe(camera_id)
+    interval = 1.0 / min(fps, MAX_CLIENT_FPS) if fps else 0.0
+    sequence = 0
+    next_due = time.monotonic()
+
+    try:
+        while True:
+            latest = producer.wait_for_frame(sequence, tier)
+            if latest is None:
+                if not producer.running:
+                    break
+                continue
+
+            # Frames published while this client was busy are skipped
+            sequence, jpeg = latest
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+
+            if interval:
+                next_due = max(next_due + interval, time.monotonic() - interval)
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+    finally:
+        producer.unsubscribe()
@@ -1,11 +1,10 @@
 
-import cv2
 import requests
 import time
 import logging
 from datetime import timedelta
 from django.shortcuts import render, redirect
-from django.http import JsonResponse, StreamingHttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
@@ -13,10 +12,13 @@ from django.db.models import Q
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import viewsets
-from .models import ParkingSlot, ParkingSession, Vehicle, Booking
+from .models import ParkingSlot, ParkingSession, Vehicle, Booking, lot_changed
 from .serializers import ParkingSlotSerializer
 from .decorators import require_staff_or_manager, require_approved_user
 from .permissions import require_staff_or_manager, require_approved_user
+from . import latency
+from .slot_status import cached_slot_status, slot_status_changes
+from .etags import conditional, slot_status_etag
 import json
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -172,7 +174,6 @@ from rest_framework import viewsets
 
 from .models import ParkingSlot, ParkingSession
 from .serializers import ParkingSlotSerializer
-import cv2
 import time
 
 # --- Standard Views ---
@@ -235,8 +236,13 @@ def login_redirect_view(request):
 @api_view(['POST'])
 @csrf_exempt  # Allow OpenCV detector to call this endpoint
 def update_slot(request):
+    from django.db import transaction
+
     slot_id = request.data.get('slot_id')
     is_occupied = request.data.get('is_occupied')
+    captured_at = latency.parse_captured_at(request.data)
+    frame_id = request.data.get('frame_id')
+    camera_id = request.data.get('camera_id')
 
     if slot_id is None or is_occupied is None:
         return Response({"error": "Missing data"}, status=400)
@@ -247,7 +253,10 @@ def update_slot(request):
     slot, created = ParkingSlot.objects.get_or_create(slot_id=slot_id)
 
     if slot.is_reserved and not is_occupied:
-        return Response({"message": f"Slot {slot_id} is reserved; ignoring vacancy signal."})
+        return Response({
+            "message": f"Slot {slot_id} is reserved; ignoring vacancy signal.",
+            "is_reserved": True
+        })
 
     # Handle camera detection for reserved slots
     if slot.is_reserved and is_occupied:
@@ -264,6 +273,7 @@ def update_slot(request):
             slot.is_occupied = True
             slot.is_reserved = False
             slot.save()
+            transaction.on_commit(lambda: latency.tracker.committed(slot_id, camera_id, captured_at, frame_id))
             
             # If this is a booking-related session, update booking camera detection
             try:
@@ -284,12 +294,176 @@ def update_slot(request):
             })
 
     # Update occupancy
-    slot.is_occupied = is_occupied
-    slot.save()
+    if slot.is_occupied != is_occupied:
+        slot.is_occupied = is_occupied
+        slot.save()
+        transaction.on_commit(lambda: latency.tracker.committed(slot_id, camera_id, captured_at, frame_id))
+    else:
+        # Heartbeat: refresh the timestamp only; update() sends no signals, so
+        # the lot version, change log and WebSocket clients are left alone
+        ParkingSlot.objects.filter(pk=slot.pk).update(timestamp=timezone.now())
 
     return Response({"message": f"Updated slot {slot_id} to {'Occupied' if is_occupied else 'Vacant'}"})
 
 
+MAX_BATCH_UPDATES = 1000
+
+
+@api_view(['POST'])
+@csrf_exempt  # Allow OpenCV detector to call this endpoint
+def update_slots_batch(request):
+    """
+    Apply many detector slot updates in one request.
+
+    Accepts {"updates": [{slot_id, is_occupied, timestamp, captured_at,
+    frame_id, camera_id}, ...]} (or a bare list) and applies them with the same rules as update_slot, inside one
+    transaction, using bulk fetches and bulk_update instead of per-slot
+    queries. Updates are applied in order, so the last record for a slot wins.
+    """
+    from django.db import transaction
+    from .slot_cache import slot_states
+
+    updates = request.data.get('updates') if isinstance(request.data, dict) else request.data
+    if not isinstance(updates, list) or not updates:
+        return Response({"error": "Expected a non-empty list of updates"}, status=400)
+    if len(updates) > MAX_BATCH_UPDATES:
+        return Response({"error": f"At most {MAX_BATCH_UPDATES} updates per batch"}, status=400)
+
+    # Validate everything before touching the database
+    records = []
+    for update in updates:
+        if not isinstance(update, dict) or update.get('slot_id') is None or update.get('is_occupied') is None:
+            return Response({"error": "Missing data", "update": update}, status=400)
+        records.append((
+            str(update['slot_id']),
+            str(update['is_occupied']).lower() in ['true', '1'],
+            update.get('timestamp'),
+            (update.get('camera_id'), latency.parse_captured_at(update), update.get('frame_id')),
+        ))
+
+    now = timezone.now()
+    results = []
+
+    with transaction.atomic():
+        slot_ids = {slot_id for slot_id, _, _, _ in records}
+
+        # Same first-match semantics as get_or_create on a non-unique slot_id
+        slots = {}
+        for slot in ParkingSlot.objects.select_for_update().filter(slot_id__in=slot_ids).order_by('id'):
+            slots.setdefault(slot.slot_id, slot)
+
+        missing = [ParkingSlot(slot_id=slot_id) for slot_id in slot_ids if slot_id not in slots]
+        if missing:
+            ParkingSlot.objects.bulk_create(missing)
+            for slot in ParkingSlot.objects.filter(slot_id__in=[slot.slot_id for slot in missing]).order_by('id'):
+                slots.setdefault(slot.slot_id, slot)
+
+        # Latest pending session per reserved slot, and their active bookings
+        pending_sessions = {}
+        reserved = [slot.pk for slot in slots.values() if slot.is_reserved]
+        if reserved:
+            for session in ParkingSession.objects.filter(slot_id__in=reserved, status='pending').order_by('id'):
+                pending_sessions[session.slot_id] = session
+
+        bookings = {}
+        if pending_sessions:
+            for booking in Booking.objects.filter(
+                parking_session__in=list(pending_sessions.values()),
+                status='active'
+            ):
+                bookings[booking.parking_session_id] = booking
+
+        dirty_slots, dirty_sessions, dirty_bookings = {}, {}, {}
+        # Slots whose reported state did not change, for a timestamp-only refresh
+        heartbeats = set()
+        # Latest change per slot, for capture-to-commit latency
+        changes = {}
+
+        for slot_id, is_occupied, timestamp, trace in records:
+            slot = slots[slot_id]
+            result = {'slot_id': slot_id, 'is_occupied': is_occupied, 'timestamp': timestamp}
+
+            if slot.is_reserved and not is_occupied:
+                result.update(status='ignored', is_reserved=True,
+                              message=f"Slot {slot_id} is reserved; ignoring vacancy signal.")
+                results.append(result)
+                continue
+
+            session = pending_sessions.pop(slot.pk, None) if slot.is_reserved else None
+            if session:
+                # AUTO-ACTIVATE SESSION (same behavior for both walk-in and bookings)
+                session.status = 'active'
+                if session.start_time is None:
+                    session.start_time = now
+                dirty_sessions[session.pk] = session
+
+                slot.is_occupied = True
+                slot.is_reserved = False
+
+                booking = bookings.get(session.pk)
+                if booking and not booking.camera_detected:
+                    booking.camera_detected = True
+                    booking.camera_detected_at = now
+                    booking.updated_at = now
+                    dirty_bookings[booking.pk] = booking
+                    logger.info(f"Camera detected and auto-activated session for booking {booking.booking_id}")
+                elif not booking:
+                    logger.info(f"Camera detected and auto-activated walk-in session {session.session_id}")
+
+                result.update(
+                    status='auto_activated',
+                    message=f"Vehicle detected in slot {slot_id}. Session {session.session_id} auto-activated.",
+                    session_id=session.session_id,
+                    auto_activated=True
+                )
+                changes[slot_id] = trace
+            else:
+                result.update(
+                    status='updated',
+                    message=f"Updated slot {slot_id} to {'Occupied' if is_occupied else 'Vacant'}"
+                )
+                if slot.is_occupied == is_occupied:
+                    heartbeats.add(slot.pk)
+                    results.append(result)
+                    continue
+                changes[slot_id] = trace
+                slot.is_occupied = is_occupied
+
+            # bulk_update bypasses auto_now, so stamp the slot explicitly
+            slot.timestamp = now
+            dirty_slots[slot.pk] = slot
+            results.append(result)
+
+        heartbeats.difference_update(dirty_slots)
+        if heartbeats:
+            # Unchanged slots only get a fresh timestamp: no version bump,
+            # change log entry or WebSocket push
+            ParkingSlot.objects.filter(pk__in=heartbeats).update(timestamp=now)
+        if dirty_slots:
+            ParkingSlot.objects.bulk_update(dirty_slots.values(), ['is_occupied', 'is_reserved', 'timestamp'])
+            # bulk_update sends no post_save, so tell the overlay cache directly
+            transaction.on_commit(slot_states.invalidate)
+        for slot_id, (camera_id, captured_at, frame_id) in changes.items():
+            transaction.on_commit(
+                lambda slot_id=slot_id, camera_id=camera_id, captured_at=captured_at, frame_id=frame_id:
+                    latency.tracker.committed(slot_id, camera_id, captured_at, frame_id)
+            )
+        if dirty_sessions:
+            ParkingSession.objects.bulk_update(dirty_sessions.values(), ['status', 'start_time'])
+        if dirty_bookings:
+            Booking.objects.bulk_update(dirty_bookings.values(), ['camera_detected', 'camera_detected_at', 'updated_at'])
+        if missing or dirty_slots:
+            # Bulk writes send no signals, so bump the lot version once here;
+            # session and booking changes are always on a dirty slot
+            lot_changed([slots[slot.slot_id].pk for slot in missing] + list(dirty_slots))
+
+    return Response({
+        "processed": len(results),
+        "auto_activated": sum(1 for result in results if result['status'] == 'auto_activated'),
+        "results": results,
+    })
+
+
 @api_view(['POST'])
 @require_staff_or_manager
 def auto_assign_slot(request):
@@ -476,97 +650,33 @@ def dashboard_view(request):
     from .dashboard_views import dashboard_view as role_based_dashboard
     return role_based_dashboard(request)
 
+@conditional(slot_status_etag)
 def slot_status_api(request):
     """API endpoint for getting slot status - accessible to all logged-in users"""
     # Check if user is authenticated - return JSON error for AJAX requests
     if not request.user.is_authenticated:
         return JsonResponse({'error': 'Authentication required'}, status=401)
     
-    slots = ParkingSlot.objects.all().order_by('slot_id')
-    data = []
-    now = timezone.now()
-    upcoming_window = timedelta(minutes=30)  # Show bookings arriving within 30 minutes
+    version, body = cached_slot_status()
 
-    for slot in slots:
-        # Check for pending/active session for this slot
-        session = ParkingSession.objects.filter(slot=slot, status__in=['pending', 'active']).last()
-        session_status = session.status if session else None
-        vehicle_number = session.vehicle_number if session else None
-        session_start = session.start_time if session else None
-
-        # Check for upcoming bookings (arriving within 30 minutes)
-        upcoming_booking = Booking.objects.filter(
-            slot=slot,
-            status='confirmed',
-            scheduled_arrival__gte=now,
-            scheduled_arrival__lte=now + upcoming_window
-        ).order_by('scheduled_arrival').first()
-
-        # Calculate when occupied slot will be free
-        estimated_free_time = None
-        if slot.is_occupied and session and session.start_time:
-            # Try to find related booking for duration
-            related_booking = Booking.objects.filter(
-                slot=slot,
-                status='active',
-                parking_session=session
-            ).first()
-            
-            if related_booking and related_booking.expected_duration:
-                estimated_free_time = (session.start_time + timedelta(minutes=related_booking.expected_duration)).isoformat()
+    latency.tracker.served()
+    return HttpResponse(body, content_type='application/json')
 
-        # Try to find user information for the vehicle
-        user_info = None
-        vehicle_info = None
-        if vehicle_number:
-            try:
-                from .models import Vehicle
-                vehicle_info = Vehicle.objects.filter(
-                    plate_number=vehicle_number,
-                    is_active=True
-                ).select_related('owner', 'owner__userprofile').first()
 
-                if vehicle_info and vehicle_info.owner:
-                    user_profile = getattr(vehicle_info.owner, 'userprofile', None)
-                    user_info = {
-                        'name': vehicle_info.owner.get_full_name() or vehicle_info.owner.username,
-                        'email': vehicle_info.owner.email,
-                        'phone': user_profile.phone_number if user_profile else None,
-                        'user_type': user_profile.get_user_type_display() if user_profile else 'Unknown'
-                    }
-            except:
-                pass
+def slot_status_changes_api(request):
+    """Slots changed since ?since=<version>; a full snapshot if the client is too far behind"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
 
-        slot_data = {
-            'id': slot.id,
-            'slot_id': slot.slot_id,
-            'is_occupied': slot.is_occupied,
-            'is_reserved': slot.is_reserved,
-            'session_status': session_status,
-            'vehicle_number': vehicle_number,
-            'session_start': session_start.isoformat() if session_start else None,
-            'timestamp': slot.timestamp.isoformat(),
-            'estimated_free_time': estimated_free_time,
-            'upcoming_booking': {
-                'booking_id': upcoming_booking.booking_id,
-                'scheduled_arrival': upcoming_booking.scheduled_arrival.isoformat(),
-                'vehicle': upcoming_booking.vehicle.plate_number if upcoming_booking.vehicle else None,
-                'customer': upcoming_booking.customer.get_full_name() or upcoming_booking.customer.username,
-                'minutes_until_arrival': int((upcoming_booking.scheduled_arrival - now).total_seconds() / 60)
-            } if upcoming_booking else None,
-            'user_info': user_info,
-            'vehicle_info': {
-                'make': vehicle_info.make if vehicle_info else None,
-                'model': vehicle_info.model if vehicle_info else None,
-                'year': vehicle_info.year if vehicle_info else None,
-                'color': vehicle_info.color if vehicle_info else None,
-                'type': vehicle_info.get_vehicle_type_display() if vehicle_info else None
-            } if vehicle_info else None
-        }
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        since = None
 
-        data.append(slot_data)
+    changes = slot_status_changes(since)
 
-    return JsonResponse(data, safe=False)
+    latency.tracker.served(None if changes['full'] else [slot['slot_id'] for slot in changes['slots']])
+    return JsonResponse(changes)
 
 
 @login_required
@@ -648,6 +758,18 @@ def slot_status_sync_api(request):
 
     # Get detection results from the latest frame (if available)
     detection_results = request.GET.get('detection_data')
+    detections = None
+    if detection_results:
+        try:
+            detections = {
+                detection['slot_id']: detection['is_occupied']
+                for detection in json.loads(detection_results)
+            }
+        except (json.JSONDecodeError, KeyError, TypeError):
+            pass
+    else:
+        # Fall back to what the standalone detector publishes through shared memory
+        detections = video_hub.detection_states() or None
 
     sync_data = []
     total_mismatches = 0
@@ -662,22 +784,16 @@ def slot_status_sync_api(request):
             'detection_status': None
         }
 
-        # If detection data is provided, compare with database
-        if detection_results:
-            try:
-                detection_data = json.loads(detection_results)
-                for detection in detection_data:
-                    if detection['slot_id'] == slot.slot_id:
-                        slot_data['detection_status'] = detection['is_occupied']
-                        slot_data['mismatch'] = detection['is_occupied'] != slot.is_occupied
-                        if slot_data['mismatch']:
-                            total_mismatches += 1
-                        break
-            except (json.JSONDecodeError, KeyError):
-                pass
+        # If detection data is available, compare with database
+        if detections and slot.slot_id in detections:
+            slot_data['detection_status'] = detections[slot.slot_id]
+            slot_data['mismatch'] = detections[slot.slot_id] != slot.is_occupied
+            if slot_data['mismatch']:
+                total_mismatches += 1
 
         sync_data.append(slot_data)
 
+    latency.tracker.served()
     return JsonResponse({
         'slots': sync_data,
         'total_mismatches': total_mismatches,
@@ -685,115 +801,67 @@ def slot_status_sync_api(request):
     })
 
 
+@api_view(['GET'])
+@require_staff_or_manager
+def latency_api(request):
+    """Capture-to-commit and capture-to-visible latency histograms per camera"""
+    return Response(latency.tracker.snapshot())
+
+
 # dashboard_analytics_api is imported from dashboard_views.py
 
 
 # live_stats_api is imported from dashboard_views.py
 
 # --- Video Streaming Logic ---
-from django.http import StreamingHttpResponse
-
-def gen_frames():
-    cap = cv2.VideoCapture(0
-                           )  # Change to 0 for webcam 1 for droidcam 2 for droidcam2 'parking_lot.mp4' for dummy video
-
-    parking_slots = [
-        (60, 0, 150, 57), (60, 56, 150, 57), (60, 115, 150, 59),
-        (60, 175, 150, 59), (60, 235, 150, 59), (60, 295, 150, 59),
-        (60, 355, 150, 59), (212, 0, 150, 57), (212, 56, 150, 57),
-        (212, 115, 150, 59), (212, 175, 150, 59), (212, 235, 150, 59),
-        (212, 295, 150, 59), (212, 355, 150, 59),
-    ]
-
-    occupancy_threshold = 0.03 #0.1
-    last_update = {}  # Track last update time for each slot to avoid too frequent updates
-
-    while True:
-        success, frame = cap.read()
-        if not success:
-            break
-
-        current_time = timezone.now()
-
-        for idx, (x, y, w, h) in enumerate(parking_slots):
-            row = 'A' if idx < 7 else 'B'
-            num = (idx % 7) + 1
-            slot_id = f"{row}{num}"
-
-            slot = frame[y:y+h, x:x+w]
-            gray = cv2.cvtColor(slot, cv2.COLOR_BGR2GRAY)
-            edges = cv2.Canny(gray, 50, 150)
-            non_zero = cv2.countNonZero(edges)
-            total_pixels = w * h
-            is_occupied = non_zero > total_pixels * occupancy_threshold
-
-            # Get or create database slot
-            try:
-                db_slot, created = ParkingSlot.objects.get_or_create(
-                    slot_id=slot_id,
-                    defaults={'is_occupied': is_occupied, 'is_reserved': False}
-                )
-
-                # Update database if detection differs and enough time has passed
-                time_since_last_update = (current_time - last_update.get(slot_id, current_time - timedelta(seconds=10))).total_seconds()
-
-                if db_slot.is_occupied != is_occupied and time_since_last_update > 1:  # Update every 1 second max
-                    # Don't update reserved slots to vacant (false vacancy signals)
-                    if not (db_slot.is_reserved and not is_occupied):
-                        # Call the API endpoint instead of directly updating database
-                        try:
-                            import requests
-                            api_url = 'http://127.0.0.1:8000/api/update-slot/'
-                            data = {
-                                'slot_id': slot_id,
-                                'is_occupied': is_occupied,
-                                'detector_id': 'video_feed'
-                            }
-                            response = requests.post(api_url, json=data, timeout=1)
-                            if response.status_code == 200:
-                                last_update[slot_id] = current_time
-                                print(f"[VIDEO FEED] API Updated {slot_id}: {'Occupied' if is_occupied else 'Vacant'}")
-                            else:
-                                print(f"[VIDEO FEED] API Error {slot_id}: {response.status_code}")
-                        except Exception as api_error:
-                            # Fallback to direct database update if API fails
-                            db_slot.is_occupied = is_occupied
-                            db_slot.save()
-                            last_update[slot_id] = current_time
-                            print(f"[VIDEO FEED] Direct DB Updated {slot_id}: {'Occupied' if is_occupied else 'Vacant'} (API failed: {api_error})")
-                    else:
-                        print(f"[VIDEO FEED] Ignoring vacancy signal for reserved slot {slot_id}")
-
-                # Simple three-state color coding: Green=Vacant, Yellow=Reserved, Red=Occupied
-                if db_slot.is_reserved and not db_slot.is_occupied:
-                    color = (0, 255, 255)  # Yellow for reserved
-                    label = f"{slot_id}: Reserved"
-                elif db_slot.is_occupied:
-                    color = (0, 0, 255)  # Red for occupied
-                    label = f"{slot_id}: Occupied"
-                else:
-                    color = (0, 255, 0)  # Green for vacant
-                    label = f"{slot_id}: Vacant"
-
-            except Exception as e:
-                # Fallback to detection if there's any database error
-                color = (0, 0, 255) if is_occupied else (0, 255, 0)
-                label = f"{slot_id}: {'Occupied' if is_occupied else 'Vacant'} (DB ERROR)"
-                print(f"[VIDEO FEED] Database error for {slot_id}: {e}")
-
-            cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
-            cv2.putText(frame, label, (x, y - 5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
-
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-
-        time.sleep(1 / 30)
+from . import video_hub
+
+def gen_frames(camera_id=video_hub.DEFAULT_CAMERA, fps=None, tier=video_hub.DEFAULT_TIER):
+    """MJPEG stream from the camera's shared producer (one capture for all viewers)"""
+    return video_hub.stream(camera_id, fps, tier)
+
+def _video_feed_options(request):
+    """Camera and quality tier from the query string, or an error response"""
+    camera_id = request.GET.get('camera', video_hub.DEFAULT_CAMERA)
+    if camera_id not in video_hub.camera_sources():
+        return None, None, JsonResponse({'error': f'Unknown camera: {camera_id}'}, status=404)
+
+    # ?quality=thumbnail|standard|full
+    tier = request.GET.get('quality', video_hub.DEFAULT_TIER)
+    if tier not in video_hub.QUALITY_TIERS:
+        return None, None, JsonResponse(
+            {'error': f"quality must be one of: {', '.join(video_hub.QUALITY_TIERS)}"}, status=400
+        )
+    return camera_id, tier, None
 
 def video_feed(request):
-    return StreamingHttpResponse(gen_frames(), content_type='multipart/x-mixed-replace; boundary=frame')
+    camera_id, tier, error = _video_feed_options(request)
+    if error:
+        return error
+
+    # Optional per-client frame rate cap, e.g. ?fps=5 for small dashboard tiles
+    try:
+        fps = float(request.GET['fps']) if request.GET.get('fps') else None
+    except ValueError:
+        return JsonResponse({'error': 'fps must be a number'}, status=400)
+    if fps is not None and fps <= 0:
+        fps = None
+
+    return StreamingHttpResponse(gen_frames(camera_id, fps, tier), content_type='multipart/x-mixed-replace; boundary=frame')
+
+def video_snapshot(request):
+    """Latest annotated frame as a single JPEG, served from the encode cache"""
+    camera_id, tier, error = _video_feed_options(request)
+    if error:
+        return error
+
+    jpeg = video_hub.snapshot(camera_id, tier)
+    if jpeg is None:
+        return JsonResponse({'error': 'No frame available from camera'}, status=503)
+
+    response = HttpResponse(jpeg, content_type='image/jpeg')
+    response['Cache-Control'] = 'no-store'
+    return response
 
 
 
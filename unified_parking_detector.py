@@ -11,10 +11,14 @@ import threading
 import json
 from datetime import datetime
 
+from detector.engine import OccupancyEngine
+from detector.scheduler import FrameScheduler
+
 class UnifiedParkingDetector:
     def __init__(self):
         self.api_url = "http://127.0.0.1:8000/api/update-slot/"
         self.status_url = "http://127.0.0.1:8000/api/slot-status/"
+        self.changes_url = "http://127.0.0.1:8000/api/slot-status/changes/"
         
         # Standardized parking slot coordinates (matching views.py)
         self.parking_slots = [
@@ -35,10 +39,13 @@ class UnifiedParkingDetector:
         ]
         
         self.occupancy_threshold = 0.1
+        self.engine = OccupancyEngine([slot['coords'] for slot in self.parking_slots])
         self.update_interval = 1.0  # Update every second
         self.last_sent = {}
         self.slot_states = {}
         self.db_states = {}
+        self.db_version = None
+        self.db_slot_ids = {}  # database id -> slot_id, to apply removals
         
         # Start background thread to sync with database
         self.sync_thread = threading.Thread(target=self.sync_with_database, daemon=True)
@@ -48,18 +55,33 @@ class UnifiedParkingDetector:
         """Periodically sync with database to get current slot states"""
         while True:
             try:
-                response = requests.get(self.status_url, timeout=5)
+                # Only slots changed since the last sync; the server sends
+                # everything on the first request or when we fell too far behind
+                params = {'since': self.db_version} if self.db_version is not None else {}
+                response = requests.get(self.changes_url, params=params, timeout=5)
                 if response.status_code == 200:
-                    slots_data = response.json()
-                    for slot_data in slots_data:
+                    changes = response.json()
+                    # Build the new maps aside and swap them in at once, so the
+                    # detection loop never sees a half-applied sync
+                    if changes['full']:
+                        db_states, db_slot_ids = {}, {}
+                    else:
+                        db_states, db_slot_ids = dict(self.db_states), dict(self.db_slot_ids)
+                    for pk in changes['removed']:
+                        db_states.pop(db_slot_ids.pop(pk, None), None)
+                    for slot_data in changes['slots']:
                         slot_id = slot_data['slot_id']
-                        self.db_states[slot_id] = {
+                        db_slot_ids[slot_data['id']] = slot_id
+                        db_states[slot_id] = {
                             'is_occupied': slot_data['is_occupied'],
                             'is_reserved': slot_data['is_reserved'],
                             'session_status': slot_data.get('session_status'),
                             'vehicle_number': slot_data.get('vehicle_number'),
                             'timestamp': slot_data.get('timestamp')
                         }
+                    self.db_slot_ids = db_slot_ids
+                    self.db_states = db_states
+                    self.db_version = changes['version']
                 else:
                     print(f"[WARNING] Failed to sync with database: {response.status_code}")
             except Exception as e:
@@ -67,15 +89,6 @@ class UnifiedParkingDetector:
             
             time.sleep(2)  # Sync every 2 seconds
     
-    def detect_occupancy(self, slot_roi):
-        """Detect if a parking slot is occupied using edge detection"""
-        gray = cv2.cvtColor(slot_roi, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 50, 150)
-        non_zero = cv2.countNonZero(edges)
-        total_pixels = slot_roi.shape[0] * slot_roi.shape[1]
-        ratio = non_zero / total_pixels
-        return ratio > self.occupancy_threshold
-    
     def send_slot_update(self, slot_id, is_occupied):
         """Send slot status update to Django API"""
         data = {
@@ -102,8 +115,9 @@ class UnifiedParkingDetector:
         now = time.time()
         
         # Always update if detection differs from database
-        if slot_id in self.db_states:
-            db_status = self.db_states[slot_id]['is_occupied']
+        db_state = self.db_states.get(slot_id)
+        if db_state is not None:
+            db_status = db_state['is_occupied']
             if detected_status != db_status:
                 print(f"[MISMATCH] {slot_id}: Detected={detected_status}, DB={db_status}")
                 return True
@@ -122,22 +136,21 @@ class UnifiedParkingDetector:
         """Process a single frame and return annotated frame with detection results"""
         detection_results = []
         
-        for slot_config in self.parking_slots:
+        # Edge density for all slots from one pass over the frame
+        occupied = self.engine.occupied(frame, self.occupancy_threshold)
+        
+        for index, slot_config in enumerate(self.parking_slots):
             slot_id = slot_config['id']
             x, y, w, h = slot_config['coords']
-            
-            # Extract slot ROI
-            slot_roi = frame[y:y+h, x:x+w]
-            
-            # Detect occupancy
-            detected_status = self.detect_occupancy(slot_roi)
+            detected_status = bool(occupied[index])
             
             # Get database status
             db_status = None
             db_info = ""
-            if slot_id in self.db_states:
-                db_status = self.db_states[slot_id]['is_occupied']
-                vehicle = self.db_states[slot_id].get('vehicle_number', '')
+            db_state = self.db_states.get(slot_id)
+            if db_state is not None:
+                db_status = db_state['is_occupied']
+                vehicle = db_state.get('vehicle_number', '')
                 if vehicle:
                     db_info = f" ({vehicle})"
             
@@ -192,9 +205,19 @@ class UnifiedParkingDetector:
         
         frame_count = 0
         start_time = time.time()
+        scheduler = FrameScheduler(source_fps=cap.get(cv2.CAP_PROP_FPS))
+        last_states = None
         
         try:
             while True:
+                # Keep real-time pacing; frames the scheduler skips are grabbed, not decoded
+                scheduler.pace()
+                if not scheduler.take():
+                    if not cap.grab():
+                        print("[INFO] End of video or failed to read frame")
+                        break
+                    continue
+                
                 ret, frame = cap.read()
                 if not ret:
                     print("[INFO] End of video or failed to read frame")
@@ -203,6 +226,14 @@ class UnifiedParkingDetector:
                 # Process frame
                 annotated_frame, results = self.process_frame(frame)
                 
+                # Full rate while detections change, disagree with the database or a session is pending
+                states = [r['detected_status'] for r in results]
+                activity = states != last_states or any(r['mismatch'] for r in results)
+                last_states = states
+                if any(db.get('session_status') == 'pending' for db in list(self.db_states.values())):
+                    scheduler.expect_activity(2)
+                scheduler.record(activity)
+                
                 # Display frame (optional)
                 cv2.imshow('Unified Parking Detection', annotated_frame)
                 
@@ -212,14 +243,12 @@ class UnifiedParkingDetector:
                     elapsed = time.time() - start_time
                     fps = frame_count / elapsed
                     mismatches = sum(1 for r in results if r['mismatch'])
-                    print(f"[INFO] Frame {frame_count}, FPS: {fps:.1f}, Mismatches: {mismatches}")
+                    print(f"[INFO] Frame {frame_count}, FPS: {fps:.1f}, Rate: {scheduler.rate:.0f}, Mismatches: {mismatches}")
                 
                 # Exit on 'q' key
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     break
                 
-                time.sleep(1/30)  # Limit to ~30 FPS
-                
         except KeyboardInterrupt:
             print("[INFO] Detection stopped by user")
         finally: